@@ -0,0 +1,358 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from app import config
+from app.model import LDPRReport
+from app.render_pool import QueueFull
+
+
+# Где живут фоновые задачи (/jobs) и индекс кэша готовых PDF.
+# "memory" — в процессе API, как раньше: годится для одного экземпляра с одним воркером uvicorn.
+# "sqlite" — в базе STATE_DB рядом с MEDIA_DIR на общем томе: задачи видят и берут все
+# экземпляры API и python -m app.worker, а ссылка /media/... открывается на любом из них.
+# SQLite рассчитан на локальный диск (том Docker на одном хосте), не на NFS.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    def __init__(self, report, output_name, id=None, status=QUEUED, created_at=None):
+        # report — LDPRReport; после завершения не хранится
+        self.id = id or uuid.uuid4().hex
+        self.report = report
+        self.output_name = output_name
+        self.status = status
+        self.error = None
+        self.cancel_requested = False
+        # Метка исполнителя, взявшего задачу (QUEUE_BACKEND=sqlite)
+        self.owner = None
+        self.created_at = created_at or time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        queue_seconds = None
+        render_seconds = None
+        if self.started_at is not None:
+            queue_seconds = round(self.started_at - self.created_at, 3)
+            if self.finished_at is not None:
+                render_seconds = round(self.finished_at - self.started_at, 3)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_seconds": queue_seconds,
+            "render_seconds": render_seconds,
+            "error": self.error,
+        }
+
+
+class MemoryJobStore:
+    # Очередь FIFO и история задач в памяти процесса
+
+    def __init__(self):
+        self._jobs = {}
+        self._queue = deque()
+        self._added = asyncio.Event()
+
+    async def add(self, job):
+        if len(self._queue) >= config.JOBS_QUEUE_LIMIT:
+            raise QueueFull()
+        self._jobs[job.id] = job
+        self._queue.append(job)
+        self._added.set()
+        self._forget_finished()
+
+    async def claim(self):
+        if not self._queue:
+            return None
+        job = self._queue.popleft()
+        job.status = RUNNING
+        job.started_at = time.time()
+        return job
+
+    async def wait(self):
+        self._added.clear()
+        await self._added.wait()
+
+    async def heartbeat(self, job):
+        # Задачу из памяти процесса другой исполнитель взять не может
+        return True
+
+    async def requeue(self, job):
+        # Останавливается весь процесс вместе с очередью, возвращать задачу некуда
+        pass
+
+    async def finish(self, job):
+        if job.cancel_requested:
+            job.status = CANCELLED
+        job.report = None
+        return job.status
+
+    async def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status == QUEUED:
+            # Из очереди убираем сразу, чтобы отменённая задача не занимала место под лимитом
+            self._queue.remove(job)
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            job.report = None
+        elif job.status == RUNNING:
+            # Процесс рендеринга не прерывается, но результат будет удалён
+            job.cancel_requested = True
+        return job
+
+    async def queued(self):
+        return len(self._queue)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(len(finished) - config.JOBS_HISTORY, 0)]:
+            del self._jobs[job_id]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    report TEXT,
+    output_name TEXT NOT NULL,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+@contextmanager
+def _connect(path):
+    # Соединение на каждый вызов: вызовы идут из разных потоков asyncio.to_thread.
+    # Транзакции — явные, BEGIN IMMEDIATE там, где сначала читаем, потом пишем.
+    db = sqlite3.connect(path, timeout=30, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _init_db(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _connect(path) as db:
+        # WAL: читатели не ждут писателя, опрос очереди не мешает отметкам задач
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(SCHEMA)
+        if "owner" not in {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}:
+            # База, созданная до появления владельцев задач
+            db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+
+class SqliteJobStore:
+    # Общая очередь: задачу атомарно забирает один UPDATE ... RETURNING, так что две
+    # копии не получат одну задачу. Исполнитель отмечается каждые JOBS_LEASE / 3 секунд;
+    # задача, по которой отметок нет дольше JOBS_LEASE (процесс упал), отдаётся снова.
+    # Взявший задачу записывает в owner свою метку, и отметки, возврат в очередь и итог
+    # принимаются только от него: исполнитель, простоявший дольше JOBS_LEASE (пауза GC,
+    # замороженный контейнер), задачу потерял и не трогает запись нового владельца.
+
+    def __init__(self, path):
+        self.path = path
+        _init_db(path)
+
+    async def add(self, job):
+        await asyncio.to_thread(self._add, job, job.report.model_dump_json())
+
+    async def claim(self):
+        return await asyncio.to_thread(self._claim)
+
+    async def wait(self):
+        await asyncio.sleep(config.JOBS_POLL_INTERVAL)
+
+    async def heartbeat(self, job):
+        # False — задачу уже отдали другому исполнителю
+        return await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND owner = ?",
+            (time.time(), job.id, job.owner),
+        ) > 0
+
+    async def requeue(self, job):
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET status = ?, started_at = NULL, heartbeat_at = NULL, owner = NULL "
+            "WHERE id = ? AND status = ? AND owner = ?",
+            (QUEUED, job.id, RUNNING, job.owner),
+        )
+
+    async def finish(self, job):
+        # Итоговый статус; None — задачу уже отдали другому исполнителю, итог не записан
+        return await asyncio.to_thread(self._finish, job)
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def cancel(self, job_id):
+        return await asyncio.to_thread(self._cancel, job_id)
+
+    async def queued(self):
+        return await asyncio.to_thread(self._queued)
+
+    def _execute(self, sql, params):
+        with _connect(self.path) as db:
+            return db.execute(sql, params).rowcount
+
+    def _add(self, job, report_json):
+        with _connect(self.path) as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                (queued,) = db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()
+                if queued >= config.JOBS_QUEUE_LIMIT:
+                    raise QueueFull()
+                db.execute(
+                    "INSERT INTO jobs (id, status, report, output_name, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job.id, job.status, report_json, job.output_name, job.created_at),
+                )
+                # История: не больше JOBS_HISTORY завершённых задач
+                db.execute(
+                    f"DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINISHED))}) AND id NOT IN ("
+                    f"SELECT id FROM jobs WHERE status IN ({','.join('?' * len(FINISHED))}) "
+                    "ORDER BY finished_at DESC LIMIT ?)",
+                    (*FINISHED, *FINISHED, config.JOBS_HISTORY),
+                )
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def _claim(self):
+        now = time.time()
+        with _connect(self.path) as db:
+            row = db.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ?, owner = ? WHERE id = ("
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND heartbeat_at < ?) "
+                "ORDER BY created_at LIMIT 1) RETURNING *",
+                (RUNNING, now, now, uuid.uuid4().hex, QUEUED, RUNNING, now - config.JOBS_LEASE),
+            ).fetchone()
+        if row is None:
+            return None
+        job = self._job(row)
+        job.owner = row["owner"]
+        job.report = LDPRReport.model_validate_json(row["report"])
+        return job
+
+    def _finish(self, job):
+        # Отмену могли запросить на другом экземпляре, поэтому итог решает база
+        with _connect(self.path) as db:
+            row = db.execute(
+                "UPDATE jobs SET status = CASE WHEN cancel_requested THEN ? ELSE ? END, "
+                "error = ?, finished_at = ?, report = NULL WHERE id = ? AND owner = ? RETURNING status",
+                (CANCELLED, job.status, job.error, job.finished_at, job.id, job.owner),
+            ).fetchone()
+        job.report = None
+        if row is None:
+            return None
+        job.status = row["status"]
+        return job.status
+
+    def _get(self, job_id):
+        with _connect(self.path) as db:
+            row = db.execute(
+                "SELECT id, status, output_name, error, cancel_requested, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return self._job(row) if row is not None else None
+
+    def _cancel(self, job_id):
+        with _connect(self.path) as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, report = NULL WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+        return self._get(job_id)
+
+    def _queued(self):
+        with _connect(self.path) as db:
+            return db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+    @staticmethod
+    def _job(row):
+        job = Job(None, row["output_name"], row["id"], row["status"], row["created_at"])
+        job.error = row["error"]
+        job.cancel_requested = bool(row["cancel_requested"])
+        job.started_at = row["started_at"]
+        job.finished_at = row["finished_at"]
+        return job
+
+
+class SqliteResultIndex:
+    # Общий индекс кэша готовых PDF: хэш отчёта -> файл в MEDIA_DIR. Экземпляр, не
+    # рендеривший отчёт сам, находит здесь файл соседа. Записи старше ttl удаляются при
+    # добавлении новых, а пропавший файл вызывающий проверяет сам.
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        _init_db(path)
+
+    def get(self, key):
+        with _connect(self.path) as db:
+            row = db.execute(
+                "SELECT filename, size, created_at FROM results WHERE key = ? AND created_at > ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+        return tuple(row) if row is not None else None
+
+    def put(self, key, filename, size, created_at):
+        with _connect(self.path) as db:
+            db.execute(
+                "INSERT OR REPLACE INTO results (key, filename, size, created_at) VALUES (?, ?, ?, ?)",
+                (key, filename, size, created_at),
+            )
+            db.execute("DELETE FROM results WHERE created_at <= ?", (time.time() - self.ttl,))
+
+
+def job_store():
+    if config.QUEUE_BACKEND == "memory":
+        return MemoryJobStore()
+    if config.QUEUE_BACKEND == "sqlite":
+        return SqliteJobStore(config.STATE_DB)
+    raise ValueError(f"Unknown QUEUE_BACKEND {config.QUEUE_BACKEND!r}, expected memory or sqlite")
+
+
+def result_index():
+    # None — индекс только в памяти процесса (ResultCache справляется сам)
+    if config.QUEUE_BACKEND == "sqlite":
+        return SqliteResultIndex(config.STATE_DB, config.RESULT_CACHE_TTL)
+    return None
@@ -0,0 +1,246 @@
+import asyncio
+import io
+import json
+import re
+import zipfile
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+
+from app import config, render_pool
+from app.media_store import media_store
+from app.model import LDPRReport
+from app.pdf_creater import merge_pdf_files
+from app.report_ir import from_model
+from app.report_renderer import render_to_media
+from app.result_cache import ResultCache, result_cache
+
+
+ZIP_CHUNK_SIZE = 64 * 1024
+UNSAFE_NAME_RE = re.compile(r"[^\w\-. ]+")
+
+
+class BatchError(Exception):
+    pass
+
+
+class BatchTooLarge(BatchError):
+    pass
+
+
+async def read_items(request):
+    # Отчёты пакета по одному: (номер, LDPRReport или None, ошибка).
+    # Тело читается до начала ответа: StreamingResponse сам слушает receive(),
+    # и дочитывать запрос параллельно с отдачей ZIP нельзя. Ошибка формата — код 400,
+    # больше BATCH_MAX_ITEMS отчётов — 413. Разбор и проверка идут в потоках, не в event loop.
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return _iterate(await _read_ndjson(request))
+    return _iterate(await run_in_threadpool(_parse_array, await request.body()))
+
+
+def _parse_array(body):
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise BatchError("Body must be a JSON array of reports or NDJSON")
+    if not isinstance(items, list):
+        raise BatchError("Body must be a JSON array of reports or NDJSON")
+    if len(items) > config.BATCH_MAX_ITEMS:
+        raise BatchTooLarge(f"Batch is limited to {config.BATCH_MAX_ITEMS} reports")
+    return [_validate(item) for item in items]
+
+
+async def _iterate(parsed):
+    for index, (report, error) in enumerate(parsed):
+        yield index, report, error
+
+
+async def _read_ndjson(request):
+    # Готовые строки разбираются в потоке по мере чтения, от сырого тела в памяти остаётся
+    # только недочитанная строка. Проверенные отчёты копятся в parsed до конца чтения.
+    # На строке сверх лимита чтение прекращается: остаток тела не нужен
+    parsed = []
+    buffer = bytearray()
+    async for chunk in request.stream():
+        start = len(buffer)
+        buffer += chunk
+        # Конец строки ищется только в новых байтах
+        end = buffer.rfind(b"\n", start)
+        if end < 0:
+            continue
+        lines = [line for line in buffer[:end].split(b"\n") if line.strip()]
+        del buffer[:end + 1]
+        if len(parsed) + len(lines) > config.BATCH_MAX_ITEMS:
+            raise BatchTooLarge(f"Batch is limited to {config.BATCH_MAX_ITEMS} reports")
+        parsed.extend(await run_in_threadpool(_parse_lines, lines))
+    if buffer.strip():
+        if len(parsed) >= config.BATCH_MAX_ITEMS:
+            raise BatchTooLarge(f"Batch is limited to {config.BATCH_MAX_ITEMS} reports")
+        parsed.extend(await run_in_threadpool(_parse_lines, [buffer]))
+    return parsed
+
+
+def _parse_lines(lines):
+    return [_parse_line(line) for line in lines]
+
+
+def _parse_line(line):
+    try:
+        item = json.loads(line)
+    except ValueError as e:
+        return None, f"Invalid JSON: {e}"
+    return _validate(item)
+
+
+def _validate(item):
+    try:
+        return LDPRReport.model_validate(item), None
+    except ValidationError as e:
+        return None, e.errors(include_url=False, include_context=False, include_input=False)
+
+
+async def render_items(items):
+    # Рендерит отчёты пакета параллельно, не больше BATCH_CONCURRENCY одновременно,
+    # и отдаёт (номер, отчёт, имя файла в media/, ошибка) в порядке готовности
+    semaphore = asyncio.Semaphore(config.BATCH_CONCURRENCY)
+    results = asyncio.Queue()
+    tasks = set()
+
+    async def render_one(index, report):
+        try:
+            filename = await _render(report)
+        except Exception as e:
+            results.put_nowait((index, report, None, str(e) or type(e).__name__))
+        else:
+            results.put_nowait((index, report, filename, None))
+        finally:
+            semaphore.release()
+
+    async def produce():
+        try:
+            async for index, report, error in items:
+                if report is None:
+                    results.put_nowait((index, None, None, error))
+                    continue
+                await semaphore.acquire()
+                task = asyncio.create_task(render_one(index, report))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            results.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (result := await results.get()) is not None:
+            yield result
+        # Ошибка чтения тела запроса (например, обрыв NDJSON) пробрасывается здесь
+        await producer
+    finally:
+        # Клиент отключился или генератор закрыт — незапущенные рендеры не нужны
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()
+
+
+async def _render(report):
+    return await _retry(lambda: result_cache.get_or_render(
+        ResultCache.key(report),
+        lambda: render_to_media(from_model(report), render_pool.BATCH),
+    ))
+
+
+async def _retry(factory):
+    while True:
+        try:
+            return await factory()
+        except render_pool.QueueFull:
+            # Пул занят другими запросами — пакет подождёт, а не упадёт
+            await asyncio.sleep(0.5)
+
+
+def entry_name(index, report):
+    name = UNSAFE_NAME_RE.sub("_", report.general_info.full_name).strip(" ._") or "report"
+    return f"{index + 1:03d}_{name}.pdf"
+
+
+class _ZipBuffer(io.RawIOBase):
+    # Несдвигаемый поток для zipfile: записанное забирается кусками через drain()
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def zip_stream(results):
+    # ZIP пишется по мере готовности отчётов; в памяти не больше одного куска файла.
+    # В конце архива manifest.json со статусом каждого отчёта пакета.
+    buffer = _ZipBuffer()
+    manifest = []
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        async for index, report, filename, error in results:
+            entry = {"index": index, "file": None, "error": error}
+            if filename is not None:
+                name = entry_name(index, report)
+                try:
+                    with open(media_store.path(filename), "rb") as src, archive.open(name, "w") as dst:
+                        while chunk := src.read(ZIP_CHUNK_SIZE):
+                            dst.write(chunk)
+                            if data := buffer.drain():
+                                yield data
+                    entry["file"] = name
+                except FileNotFoundError:
+                    entry["error"] = "Rendered file is no longer available"
+            manifest.append(entry)
+            if data := buffer.drain():
+                yield data
+        manifest.sort(key=lambda entry: entry["index"])
+        archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    yield buffer.drain()
+
+
+def errors_header(failed, limit):
+    # JSON-список для заголовка (X-Batch-Errors, X-Rollup-Skipped): ошибки валидации бывают
+    # большими, а заголовки ограничены (у прокси и клиентов — 8-16 КБ на все), поэтому берутся
+    # первые записи, которые помещаются в limit байт. Полное число записей — в соседнем заголовке.
+    parts = []
+    size = 2
+    for entry in failed:
+        part = json.dumps(entry, separators=(",", ":"))
+        extra = len(part) + (1 if parts else 0)
+        if size + extra > limit:
+            break
+        parts.append(part)
+        size += extra
+    return f"[{','.join(parts)}]"
+
+
+async def merge(results, output_path):
+    # Сводный PDF в порядке пакета. Готовые отчёты лежат в media/, в память они не читаются;
+    # склейка идёт в процессе пула, и ответ можно отдать только после последнего отчёта.
+    manifest = []
+    async for index, report, filename, error in results:
+        entry = {"index": index, "title": None, "path": None, "error": error}
+        if filename is not None:
+            entry["title"] = report.general_info.full_name
+            entry["path"] = media_store.path(filename)
+        manifest.append(entry)
+    manifest.sort(key=lambda entry: entry["index"])
+
+    items = [(entry["path"], entry["title"]) for entry in manifest if entry["path"] is not None]
+    if items:
+        await _retry(lambda: render_pool.run(merge_pdf_files, items, output_path, priority=render_pool.BATCH))
+    return [{"index": entry["index"], "error": entry["error"]} for entry in manifest]
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from app import config
+
+
+class BarCache:
+    # Отрисованные полосы диаграммы по ключу (формат, подпись, значение, максимум).
+    # В памяти — LRU с ограничением по байтам, на диске — файлы с именем по хэшу ключа.
+    # /preview рисует диаграмму в потоках run_in_threadpool, поэтому LRU под блокировкой.
+
+    def __init__(self, max_bytes, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(kind, label, value, max_value):
+        digest = hashlib.sha256(f"{label}\0{value}\0{max_value}".encode("utf-8")).hexdigest()
+        return f"{digest}.{kind}"
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+        # Файл читается без блокировки, другие потоки в это время работают с памятью
+        data = self._read(key) if self.directory else None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self._remember(key, data)
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+        if self.directory:
+            self._write(key, data)
+
+    def clear(self):
+        # Только память: файлы на диске остаются общими для всех процессов
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._items),
+                "bytes": self._bytes,
+            }
+
+    def _remember(self, key, data):
+        # Вызывается под self._lock
+        if len(data) > self.max_bytes:
+            return
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._items[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _read(self, key):
+        try:
+            with open(os.path.join(self.directory, key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key, data):
+        # Пишем во временный файл и переименовываем: другие процессы не увидят недописанный файл
+        path = os.path.join(self.directory, key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+bar_cache = BarCache(config.CHART_CACHE_BYTES, config.CHART_CACHE_DIR)
@@ -0,0 +1,109 @@
+from html import escape
+
+from app.chart_cache import bar_cache
+
+
+# Подписи диаграммы обращений и соответствующие поля Requests
+CHART_CATEGORIES = (
+    ("ЖКХ", "utilities"),
+    ("Пенсии и выплаты", "pensions_and_social_payments"),
+    ("Благоустройство", "improvement"),
+    ("Образование", "education"),
+    ("СВО", "svo"),
+    ("Дороги", "road_maintenance"),
+    ("Экология", "ecology"),
+    ("Медицина", "medicine_and_healthcare"),
+    ("Транспорт", "public_transport"),
+    ("Несанкционированные \nсвалки", "illegal_dumps"),
+#    ("Обращение\nк Председателю ЛДПР", "appeals_to_ldpr_chairman"),
+    ("Юридическая помощь", "legal_aid_requests"),
+    ("Развитие территорий", "integrated_territory_development"),
+    ("Бесхозяйные животные  ", "stray_animal_issues"),
+    ("Законодательные \nпредложения", "legislative_proposals"),
+)
+
+BAR_COLOR = "#394B8C"
+
+# Геометрия повторяет PNG-вариант generate_bar_chart (единицы — пункты):
+# фигура 10in, ось занимает 0.3-0.9 ширины, подчёркивание начинается на -0.64 ширины оси
+AXES_WIDTH = 432.0
+AXES_LEFT = AXES_WIDTH * 0.64 + 6
+CHART_WIDTH = AXES_LEFT + AXES_WIDTH + 6
+LABEL_FONT_SIZE = 16
+LABEL_CHAR_WIDTH = LABEL_FONT_SIZE * 0.602  # DejaVu Sans Mono
+LABEL_LINE_HEIGHT = 19.2
+VALUE_FONT_SIZE = 14
+BAR_HEIGHT = 23
+ROW_HEIGHT = 37.4
+# Каждая дополнительная строка подписи добавляет высоты строке диаграммы
+EXTRA_LINE_HEIGHT = 15.6
+
+
+# Подписи выравниваются по самой длинной строке, включая хвостовые пробелы
+LABEL_LENGTH = max(len(line) for label, _ in CHART_CATEGORIES for line in label.split("\n"))
+LABEL_X = AXES_LEFT - AXES_WIDTH * 0.01 - LABEL_LENGTH * LABEL_CHAR_WIDTH
+
+
+def render_svg_chart(requests):
+    # requests — report_ir.CitizenRequests: строки уже отсортированы, максимум посчитан
+    rows = requests.chart_rows
+    max_value = requests.chart_max
+    if not rows:
+        return ""
+
+    x_min, x_max = 0.2, max_value * 1.1
+
+    def to_x(value):
+        return AXES_LEFT + (value - x_min) / (x_max - x_min) * AXES_WIDTH
+
+    parts = []
+    top = 0
+    for label, value in rows:
+        lines = [line.rstrip() for line in label.split("\n")]
+        extra = len(lines) - 1
+        # Строка рисуется от нуля и сдвигается на место, поэтому её можно кэшировать
+        cache_key = bar_cache.key("svg", label, value, max_value)
+        row = bar_cache.get(cache_key)
+        if row is None:
+            center = ROW_HEIGHT / 2 + EXTRA_LINE_HEIGHT * extra
+            row = _svg_row(lines, value, max_value, center, LABEL_X, to_x).encode("utf-8")
+            bar_cache.put(cache_key, row)
+        parts.append(f'<g transform="translate(0 {top:.1f})">{row.decode("utf-8")}</g>')
+        top += ROW_HEIGHT + EXTRA_LINE_HEIGHT * extra
+
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" class="requests-chart" width="100%" '
+        f'viewBox="0 0 {CHART_WIDTH:.1f} {top:.1f}" font-weight="bold">'
+        f'{"".join(parts)}</svg>'
+    )
+    return svg
+
+
+def _svg_row(lines, value, max_value, center, label_x, to_x):
+    bar_left = AXES_LEFT
+    bar_right = to_x(value)
+    bar_bottom = center + BAR_HEIGHT / 2
+    parts = [
+        f'<rect x="{bar_left:.1f}" y="{center - BAR_HEIGHT / 2:.1f}" width="{bar_right - bar_left:.1f}" '
+        f'height="{BAR_HEIGHT}" fill="{BAR_COLOR}"/>',
+        f'<line x1="{AXES_LEFT - AXES_WIDTH * 0.64:.1f}" y1="{bar_bottom:.1f}" '
+        f'x2="{AXES_LEFT + AXES_WIDTH * 0.1:.1f}" y2="{bar_bottom:.1f}" stroke="{BAR_COLOR}" stroke-width="2"/>',
+    ]
+
+    # Последняя строка подписи на уровне столбца, предыдущие — выше неё
+    for i, line in enumerate(lines):
+        baseline = center + LABEL_FONT_SIZE * 0.3 - (len(lines) - 1 - i) * LABEL_LINE_HEIGHT
+        parts.append(
+            f'<text x="{label_x:.1f}" y="{baseline:.1f}" '
+            f'font-family="DejaVu Sans Mono, monospace" font-size="{LABEL_FONT_SIZE}">{escape(line)}</text>'
+        )
+
+    if value > max_value / 15:
+        text_x, anchor, color = to_x(value * 0.95), "end", "white"
+    else:
+        text_x, anchor, color = to_x(value + max_value * 0.02), "start", "black"
+    parts.append(
+        f'<text x="{text_x:.1f}" y="{center + VALUE_FONT_SIZE * 0.35:.1f}" text-anchor="{anchor}" '
+        f'font-family="DejaVu Sans, sans-serif" font-size="{VALUE_FONT_SIZE}" fill="{color}">{value}</text>'
+    )
+    return "".join(parts)
@@ -0,0 +1,181 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pydantic import ValidationError
+
+from app import config
+from app.model import LDPRReport
+from app.pdf_creater import load_json_data
+from app.report_ir import from_model
+from app.result_cache import ResultCache
+
+
+# Запуск из src:
+#   python -m app.cli reports/ -o pdf/            все *.json каталога
+#   python -m app.cli "archive/**/*.json" -o pdf/
+# Уже готовые PDF пропускаются по хэшу в манифесте каталога вывода (--force — рендерить всё).
+
+MANIFEST_NAME = ".render-manifest.json"
+# Как часто сохранять манифест, чтобы прерванный прогон можно было продолжить
+MANIFEST_SAVE_INTERVAL = 5
+
+
+def find_sources(patterns):
+    sources = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            sources.extend(sorted(glob.glob(os.path.join(pattern, "*.json"))))
+        elif glob.has_magic(pattern):
+            sources.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            sources.append(pattern)
+    # Один и тот же файл мог попасть под несколько шаблонов
+    return list(dict.fromkeys(os.path.abspath(source) for source in sources))
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def prepare(source):
+    # (имя PDF, хэш содержимого, нормализованный отчёт); хэш тот же, что у кэша готовых PDF в API
+    report = LDPRReport.model_validate(load_json_data(source))
+    output = os.path.splitext(os.path.basename(source))[0] + ".pdf"
+    return output, ResultCache.key(report), from_model(report)
+
+
+def _init_worker():
+    from app import morphology, styles
+    morphology.warm_up()
+    styles.warm_up()
+
+
+def render_file(report, output_path, debug=False):
+    from app.pdf_creater import generate_pdf_report
+
+    started = time.perf_counter()
+    # Пишем во временный файл: прерванный рендер не оставит битый PDF под итоговым именем
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        generate_pdf_report(report, tmp_path, debug)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return time.perf_counter() - started, os.path.getsize(output_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный рендер отчётов ЛДПР в PDF")
+    parser.add_argument("sources", nargs="+", help="JSON-файлы, каталоги или glob-шаблоны")
+    parser.add_argument("-o", "--output-dir", default=".", help="каталог для PDF (по умолчанию текущий)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="число процессов")
+    parser.add_argument("--force", action="store_true", help="рендерить и актуальные PDF")
+    parser.add_argument("--debug", action="store_true", help="сохранять debug.html (имеет смысл для одного файла)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    os.makedirs(config.TMP_DIR, exist_ok=True)
+    sources = find_sources(args.sources)
+    manifest = load_manifest(args.output_dir)
+
+    pending = []
+    outputs = {}
+    skipped = 0
+    failed = 0
+    for source in sources:
+        try:
+            output, digest, report = prepare(source)
+        except (OSError, ValueError, ValidationError) as e:
+            failed += 1
+            print(f"FAIL  {source}: {e}", file=sys.stderr)
+            continue
+        if output in outputs:
+            failed += 1
+            print(f"FAIL  {source}: same output name as {outputs[output]}", file=sys.stderr)
+            continue
+        outputs[output] = source
+        entry = manifest.get(output)
+        output_path = os.path.join(args.output_dir, output)
+        if not args.force and entry and entry["hash"] == digest and os.path.exists(output_path):
+            skipped += 1
+            continue
+        pending.append((source, output, digest, report))
+
+    print(f"{len(sources)} files: {len(pending)} to render, {skipped} up to date, {failed} invalid")
+    if not pending:
+        return 1 if failed else 0
+
+    started = time.perf_counter()
+    rendered = 0
+    timings = []
+    total_bytes = 0
+    render_seconds = 0.0
+    last_save = time.monotonic()
+    workers = max(1, min(args.workers, len(pending)))
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+    try:
+        futures = {
+            executor.submit(render_file, report, os.path.join(args.output_dir, output), args.debug): (source, output, digest)
+            for source, output, digest, report in pending
+        }
+        for future in as_completed(futures):
+            source, output, digest = futures[future]
+            try:
+                seconds, size = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"FAIL  {source}: {e}", file=sys.stderr)
+                continue
+            rendered += 1
+            total_bytes += size
+            render_seconds += seconds
+            timings.append((seconds, output))
+            manifest[output] = {"source": source, "hash": digest, "seconds": round(seconds, 3), "bytes": size}
+            print(f"ok    {seconds:7.2f}s {size / 1024:8.0f} KB  {output}")
+            if time.monotonic() - last_save > MANIFEST_SAVE_INTERVAL:
+                save_manifest(args.output_dir, manifest)
+                last_save = time.monotonic()
+    except KeyboardInterrupt:
+        print("Interrupted, progress is saved; run again to continue", file=sys.stderr)
+        raise
+    finally:
+        save_manifest(args.output_dir, manifest)
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Rendered {rendered} in {elapsed:.1f}s with {workers} workers: "
+        f"{rendered / elapsed:.2f} files/s, {total_bytes / 1024 / 1024 / elapsed:.2f} MB/s, "
+        f"mean {render_seconds / max(rendered, 1):.2f}s per file; "
+        f"{skipped} up to date, {failed} failed"
+    )
+    for seconds, output in sorted(timings, reverse=True)[:5]:
+        print(f"slow  {seconds:7.2f}s  {output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return int(value)
+
+
+# Пул процессов рендеринга PDF
+RENDER_WORKERS = _env_int("RENDER_WORKERS", os.cpu_count() or 1)
+# Сколько рендеров может ждать свободный процесс, прежде чем отвечать 503
+RENDER_QUEUE_LIMIT = _env_int("RENDER_QUEUE_LIMIT", RENDER_WORKERS * 4)
+RENDER_RETRY_AFTER = _env_int("RENDER_RETRY_AFTER", 5)
+# Сколько секунд запрос POST / может ждать начала рендера, потом 503 (клиент может сократить
+# заголовком X-Render-Deadline); и как часто проверять, не отключился ли клиент
+RENDER_DEADLINE = _env_int("RENDER_DEADLINE", 60)
+DISCONNECT_POLL_INTERVAL = 0.5
+# Прогрев воркеров тестовым отчётом при старте; без него тяжёлые библиотеки грузятся на первом запросе
+RENDER_WARMUP = os.environ.get("RENDER_WARMUP", "1").lower() in ("1", "true", "yes")
+
+# Перезапуск воркеров против роста памяти: процесс заменяется после RENDER_MAX_TASKS рендеров
+# или когда его RSS после рендера превысил RENDER_MAX_RSS_MB. 0 — без ограничения.
+RENDER_MAX_TASKS = _env_int("RENDER_MAX_TASKS", 200)
+RENDER_MAX_RSS_MB = _env_int("RENDER_MAX_RSS_MB", 0)
+# tracemalloc в воркерах: после каждого рендера в stderr пишется, где выросла куча Python (медленно)
+MEMORY_DEBUG = os.environ.get("MEMORY_DEBUG", "").lower() in ("1", "true", "yes")
+
+# Строка JSON с временем стадий после каждого рендера (логгер app.metrics)
+TIMING_LOG = os.environ.get("TIMING_LOG", "").lower() in ("1", "true", "yes")
+
+# Большие отчёты (от LARGE_REPORT_ITEMS пунктов во всех списках) верстаются
+# по частям параллельно в нескольких процессах, не больше LARGE_REPORT_CHUNKS частей
+LARGE_REPORT_ITEMS = _env_int("LARGE_REPORT_ITEMS", 150)
+LARGE_REPORT_CHUNKS = _env_int("LARGE_REPORT_CHUNKS", min(RENDER_WORKERS, 4))
+
+# Пакетный рендер (/batch): сколько отчётов в пакете и сколько рендерится одновременно
+BATCH_MAX_ITEMS = _env_int("BATCH_MAX_ITEMS", 500)
+BATCH_CONCURRENCY = _env_int("BATCH_CONCURRENCY", RENDER_WORKERS)
+# Сводный PDF пакета: предел размера заголовка X-Batch-Errors с ошибками отчётов
+BATCH_ERRORS_HEADER_BYTES = _env_int("BATCH_ERRORS_HEADER_BYTES", 4096)
+# Сводка по регионам (/rollup): сколько отчётов можно прислать одним запросом
+ROLLUP_MAX_ITEMS = _env_int("ROLLUP_MAX_ITEMS", 20000)
+# и сколько байт в теле запроса: больше — 413, не дочитывая
+ROLLUP_MAX_BYTES = _env_int("ROLLUP_MAX_BYTES", 256 * 1024 * 1024)
+
+# Фоновые задачи рендеринга (/jobs)
+JOBS_QUEUE_LIMIT = _env_int("JOBS_QUEUE_LIMIT", 500)
+# Сколько завершённых задач хранить для опроса статуса
+JOBS_HISTORY = _env_int("JOBS_HISTORY", 1000)
+# Рендерить фоновые задачи в процессе API; 0 — только принимать, рендерит python -m app.worker
+JOBS_DISPATCH = os.environ.get("JOBS_DISPATCH", "1").lower() in ("1", "true", "yes")
+# Задача, исполнитель которой не отмечался JOBS_LEASE секунд, отдаётся другому (QUEUE_BACKEND=sqlite)
+JOBS_LEASE = _env_int("JOBS_LEASE", 60)
+JOBS_POLL_INTERVAL = 0.5
+
+# Очередь задач и индекс кэша PDF: "memory" — в процессе (один экземпляр API),
+# "sqlite" — в базе STATE_DB, общей для нескольких экземпляров и воркеров.
+# Тогда STATE_DB и MEDIA_DIR должны лежать на общем томе.
+QUEUE_BACKEND = os.environ.get("QUEUE_BACKEND", "memory").lower()
+STATE_DB = os.environ.get("STATE_DB", "state/ldpr.sqlite3")
+
+# Размер LRU-кэша словоформ pymorphy3
+MORPH_CACHE_SIZE = _env_int("MORPH_CACHE_SIZE", 1024)
+
+# Диаграмма обращений: "svg" — одна встроенная векторная картинка, "png" — растровые полосы matplotlib
+CHART_FORMAT = os.environ.get("CHART_FORMAT", "svg").lower()
+
+# Профиль вывода PDF: "speed" — быстрее запись, шрифты целиком; "balanced" — подмножества шрифтов
+# и картинки не плотнее 150 dpi; "size" — ещё пережатие картинок и склейка одинаковых объектов
+PDF_PROFILE = os.environ.get("PDF_PROFILE", "balanced").lower()
+# Переопределяют профиль: предел dpi растровых картинок в PDF (0 — без предела) и dpi полос PNG-диаграммы
+PDF_DPI = _env_int("PDF_DPI", None)
+CHART_DPI = _env_int("CHART_DPI", None)
+
+# Кэш отрисованных полос диаграммы: лимит памяти на процесс и (опционально) каталог на диске
+CHART_CACHE_BYTES = _env_int("CHART_CACHE_BYTES", 32 * 1024 * 1024)
+CHART_CACHE_DIR = os.environ.get("CHART_CACHE_DIR") or None
+
+# Предпросмотр HTML (/preview): сколько готовых секций держать в памяти процесса API
+PREVIEW_CACHE_ENTRIES = _env_int("PREVIEW_CACHE_ENTRIES", 2048)
+
+# Таймаут для внешних ресурсов, которых нет среди встроенных (секунды)
+REMOTE_FETCH_TIMEOUT = _env_int("REMOTE_FETCH_TIMEOUT", 3)
+REMOTE_FETCH_CACHE_ENTRIES = _env_int("REMOTE_FETCH_CACHE_ENTRIES", 64)
+
+# Кэш готовых PDF для одинаковых отчётов: объём и время жизни (секунды) записей кэша.
+# Сами файлы не удаляются вместе с записью, их срок — MEDIA_TTL и MEDIA_MAX_BYTES
+RESULT_CACHE_BYTES = _env_int("RESULT_CACHE_BYTES", 512 * 1024 * 1024)
+RESULT_CACHE_TTL = _env_int("RESULT_CACHE_TTL", 24 * 60 * 60)
+# PDF, отданные прямо в ответе, хранятся только в памяти
+RESULT_CACHE_MEMORY_BYTES = _env_int("RESULT_CACHE_MEMORY_BYTES", 64 * 1024 * 1024)
+
+# Хранилище готовых PDF
+MEDIA_DIR = os.environ.get("MEDIA_DIR", "media")
+MEDIA_TTL = _env_int("MEDIA_TTL", 7 * 24 * 60 * 60)
+MEDIA_MAX_BYTES = _env_int("MEDIA_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+MEDIA_CLEANUP_INTERVAL = _env_int("MEDIA_CLEANUP_INTERVAL", 10 * 60)
+# Временные картинки диаграмм: всё старше TMP_MAX_AGE осталось от упавших рендеров
+TMP_DIR = os.environ.get("TMP_DIR", "tmp")
+TMP_MAX_AGE = _env_int("TMP_MAX_AGE", 60 * 60)
+
+# Отчётный период в шапке: "по итогам ..."
+REPORT_PERIOD = os.environ.get("REPORT_PERIOD", "осенней сессии 2025 года")
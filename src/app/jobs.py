@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+
+from app import backends, config, metrics, render_pool
+from app.backends import CANCELLED, DONE, FAILED, Job
+from app.media_store import media_store
+from app.report_ir import from_model
+from app.report_renderer import render_report
+
+
+_store = None
+_dispatchers = []
+
+
+def start(dispatch=True):
+    # dispatch=False — только приём и статус задач, рендерят другие процессы (python -m app.worker)
+    global _store
+    if _store is not None:
+        return
+    _store = backends.job_store()
+    if dispatch:
+        # Один диспетчер на процесс рендеринга: задачи берутся строго по очереди (FIFO)
+        for _ in range(config.RENDER_WORKERS):
+            _dispatchers.append(asyncio.create_task(_dispatch()))
+
+
+async def stop():
+    global _store
+    for task in _dispatchers:
+        task.cancel()
+    await asyncio.gather(*_dispatchers, return_exceptions=True)
+    _dispatchers.clear()
+    _store = None
+
+
+async def submit(report):
+    # report — LDPRReport; PDF появится в media/ под именем job.output_name
+    job = Job(report, media_store.new_name())
+    await _store.add(job)
+    return job
+
+
+async def queued():
+    return await _store.queued() if _store is not None else 0
+
+
+async def get(job_id):
+    return await _store.get(job_id)
+
+
+async def cancel(job_id):
+    return await _store.cancel(job_id)
+
+
+async def _dispatch():
+    while True:
+        job = await _store.claim()
+        if job is None:
+            await _store.wait()
+            continue
+        metrics.observe_job_queue_wait(job.started_at - job.created_at)
+        # PDF пишется во временный файл и получает своё имя, только пока задача ещё за этим
+        # исполнителем: если её отдали другому, тот пишет в тот же output_name
+        part = media_store.part_path(job.output_name)
+        heartbeat = asyncio.create_task(_heartbeat(job))
+        try:
+            await _run(job, part)
+        except asyncio.CancelledError:
+            # Процесс останавливается: задачу сразу возьмёт другой исполнитель
+            _remove(part)
+            await _store.requeue(job)
+            raise
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e) or type(e).__name__
+        else:
+            job.status = DONE
+        finally:
+            heartbeat.cancel()
+        job.finished_at = time.time()
+        if job.status == DONE and await _store.heartbeat(job):
+            os.replace(part, media_store.path(job.output_name))
+        status = await _store.finish(job)
+        # None — задачу потеряли: итог и файл за новым исполнителем
+        _remove(part)
+        if status == CANCELLED:
+            _remove(media_store.path(job.output_name))
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def _heartbeat(job):
+    while True:
+        await asyncio.sleep(config.JOBS_LEASE / 3)
+        if not await _store.heartbeat(job):
+            # Задачу уже отдали другому исполнителю, продлевать нечего
+            return
+
+
+async def _run(job, output_filename):
+    report = from_model(job.report)
+    while True:
+        try:
+            return await render_report(report, output_filename, priority=render_pool.BACKGROUND)
+        except render_pool.QueueFull:
+            # Пул занят синхронными запросами — ждём, не теряя место в очереди
+            await asyncio.sleep(0.5)
@@ -1,16 +1,58 @@
+import asyncio
+import importlib
+import logging
 import os
+import time
 import uuid
+from contextlib import asynccontextmanager
+from urllib.parse import quote
 
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware  # Add this import
+from starlette.background import BackgroundTask
 
-from app.pdf_creater import generate_pdf_report
+from app import batch, config, jobs, memory, metrics, preview, render_pool
+from app.media_store import media_store
 from app.model import LDPRReport
+from app.report_ir import from_model
+from app.report_renderer import render_report, render_to_media
+from app.result_cache import ResultCache, result_cache
 
 
-app = FastAPI()
-app.mount("/media", StaticFiles(directory="media"), name="media")
+PDF_CHUNK_SIZE = 64 * 1024
+
+# Логгер uvicorn уже настроен на INFO, сообщения о старте попадают в тот же вывод
+logger = logging.getLogger("uvicorn.error")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    started = time.perf_counter()
+    render_pool.start()
+    if config.RENDER_WARMUP:
+        # Запросы начнут приниматься только после прогрева всех воркеров
+        boots = await render_pool.warm_up()
+        metrics.record_boot(boots.values(), time.perf_counter() - started)
+        for pid, timings in boots.items():
+            if timings:
+                logger.info(
+                    "Render worker %s: import %.2fs, warm-up render %.2fs",
+                    pid, timings["import_seconds"], timings["warmup_seconds"],
+                )
+            else:
+                logger.warning("Render worker %s: warm-up failed, renders will start cold", pid)
+        logger.info("Render pool ready in %.2fs", time.perf_counter() - started)
+    jobs.start(dispatch=config.JOBS_DISPATCH)
+    cleanup = asyncio.create_task(media_store.run_cleanup(config.MEDIA_CLEANUP_INTERVAL))
+    yield
+    cleanup.cancel()
+    await jobs.stop()
+    render_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 # Add these CORS middleware settings
 # app.add_middleware(
 #     CORSMiddleware,
@@ -34,9 +76,247 @@ async def ping():
     return {"message": "Pong"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    # Всё считается только здесь, на каждый рендер приходится лишь сложение замеров
+    cache = result_cache.stats()
+    media = media_store.stats()
+    fragments = preview.fragment_cache.stats()
+    text = metrics.render_text(
+        counters=(
+            ("ldpr_result_cache_hits_total", cache["hits"]),
+            ("ldpr_result_cache_misses_total", cache["misses"]),
+            ("ldpr_result_cache_coalesced_total", cache["coalesced"]),
+            ("ldpr_media_evicted_total", media["evicted"]),
+            ("ldpr_preview_fragment_hits_total", fragments["hits"]),
+            ("ldpr_preview_fragment_misses_total", fragments["misses"]),
+        ),
+        gauges=(
+            ("ldpr_render_pending", render_pool.pending()),
+            ("ldpr_render_waiting", render_pool.waiting()),
+            ("ldpr_jobs_queued", await jobs.queued()),
+            ("ldpr_result_cache_bytes", cache["bytes"]),
+            ("ldpr_media_files", media["files"]),
+            ("ldpr_media_bytes", media["bytes"]),
+            # Только процесс API; воркеры рендера — в ldpr_render_peak_rss_bytes
+            ("ldpr_process_rss_bytes", memory.rss() or 0),
+        ),
+    )
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/media/{name}")
+async def get_media(name: str, request: Request):
+    response = media_store.response(name, request.headers.get("if-none-match"))
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
+
+
 @app.post("/")
-async def create_pdf(report: LDPRReport, request: Request):
-    report_filename = f"report_{uuid.uuid4()}.pdf"
-    report_filepath = os.path.join("media", report_filename)
-    generate_pdf_report(report.dict(), report_filepath)
+async def create_pdf(report: LDPRReport, request: Request, format: str | None = None):
+    # ?format=pdf или Accept: application/pdf — PDF сразу в теле ответа, без media/
+    deadline = _deadline(request)
+    if format == "pdf" or "application/pdf" in request.headers.get("accept", ""):
+        try:
+            pdf = await _unless_disconnected(request, result_cache.get_or_render_bytes(
+                ResultCache.key(report),
+                lambda: render_report(from_model(report), deadline=deadline),
+            ))
+        except render_pool.QueueFull:
+            raise _queue_full()
+        return _pdf_response(pdf, f"Отчет_{report.general_info.full_name}.pdf")
+
+    try:
+        report_filename = await _unless_disconnected(request, result_cache.get_or_render(
+            ResultCache.key(report),
+            lambda: render_to_media(from_model(report), deadline=deadline),
+        ))
+    except render_pool.QueueFull:
+        raise _queue_full()
     return {"status": "Success", "message": f"{request.base_url}media/{report_filename}"}
+
+
+@app.post("/preview")
+async def create_preview(report: LDPRReport, section: str | None = None):
+    # Черновик для формы: HTML всего отчёта или (?section=legislation) одной секции.
+    # Рендер PDF не запускается, пул процессов не занимается.
+    if section is not None and section not in preview.SECTIONS:
+        raise HTTPException(status_code=400, detail=f"section must be one of: {', '.join(preview.SECTIONS)}")
+    ir = from_model(report)
+    if section is None:
+        html = await run_in_threadpool(preview.render_preview, ir)
+    else:
+        html = await run_in_threadpool(preview.render_section, ir, section)
+    return HTMLResponse(html, headers={"Cache-Control": "no-store"})
+
+
+@app.post("/batch")
+async def create_batch(request: Request, format: str = "zip"):
+    # Пакет отчётов: JSON-массив или NDJSON (Content-Type: application/x-ndjson).
+    # ?format=zip — архив, который отдаётся по мере готовности отчётов, с manifest.json в конце;
+    # ?format=pdf — один сводный PDF, число неудавшихся отчётов в заголовке X-Batch-Failed,
+    # их ошибки (сколько поместится в BATCH_ERRORS_HEADER_BYTES) — в X-Batch-Errors.
+    if format not in ("zip", "pdf"):
+        raise HTTPException(status_code=400, detail="format must be zip or pdf")
+    try:
+        items = await batch.read_items(request)
+    except batch.BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except batch.BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "zip":
+        return StreamingResponse(
+            batch.zip_stream(batch.render_items(items)),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="reports.zip"'},
+        )
+
+    output_path = os.path.join(config.TMP_DIR, f"batch_{uuid.uuid4().hex}.pdf")
+    errors = await batch.merge(batch.render_items(items), output_path)
+    failed = [entry for entry in errors if entry["error"] is not None]
+    if not os.path.exists(output_path):
+        raise HTTPException(status_code=422, detail=failed)
+    return FileResponse(
+        output_path,
+        media_type="application/pdf",
+        filename="reports.pdf",
+        headers={
+            "X-Batch-Failed": str(len(failed)),
+            "X-Batch-Errors": batch.errors_header(failed, config.BATCH_ERRORS_HEADER_BYTES),
+        },
+        background=BackgroundTask(os.remove, output_path),
+    )
+
+
+@app.post("/rollup")
+async def create_rollup(request: Request, format: str = "pdf"):
+    # Сводка по регионам из пакета отчётов (JSON-массив или NDJSON, как у /batch):
+    # ?format=pdf — сводный PDF, ?format=json — те же цифры в JSON.
+    # Неверные отчёты пропускаются: их число — в X-Rollup-Skipped-Count, номера
+    # (сколько поместится в BATCH_ERRORS_HEADER_BYTES) — в X-Rollup-Skipped.
+    if format not in ("pdf", "json"):
+        raise HTTPException(status_code=400, detail="format must be pdf or json")
+    # NumPy и вёрстка сводки нужны только здесь: не импортируются при старте API,
+    # а первый импорт идёт в потоке, чтобы не останавливать event loop
+    rollup = await run_in_threadpool(importlib.import_module, "app.rollup")
+
+    # Разбор и проверка тысяч отчётов — секунды CPU, и всё это делается в пуле процессов,
+    # как в python -m app.rollup: процесс API только читает тело и режет его на части по строкам
+    ndjson = any(kind in request.headers.get("content-type", "") for kind in ("ndjson", "jsonl"))
+    try:
+        body = await rollup.read_body(request, ndjson, config.ROLLUP_MAX_ITEMS, config.ROLLUP_MAX_BYTES)
+        if not ndjson:
+            body = await render_pool.run(rollup.to_ndjson, body, config.ROLLUP_MAX_ITEMS, priority=render_pool.BATCH)
+        parts = await render_pool.gather(
+            [(rollup.load_rows, (part,)) for part in rollup.split_ndjson(body, config.RENDER_WORKERS)],
+            render_pool.BATCH,
+        )
+    except render_pool.QueueFull:
+        raise _queue_full()
+    except rollup.RollupTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    del body
+    results = [result for part in parts for result in part]
+    summary, skipped = await run_in_threadpool(rollup.summarize, results)
+    if summary is None:
+        raise HTTPException(status_code=422, detail="No valid reports")
+    headers = {
+        "X-Rollup-Skipped-Count": str(len(skipped)),
+        "X-Rollup-Skipped": batch.errors_header(skipped, config.BATCH_ERRORS_HEADER_BYTES),
+    }
+    if format == "json":
+        return JSONResponse(await run_in_threadpool(rollup.to_dict, summary), headers=headers)
+
+    try:
+        pdf = await render_pool.run(rollup.generate_rollup_pdf, summary, priority=render_pool.BATCH)
+    except render_pool.QueueFull:
+        raise _queue_full()
+    return _pdf_response(pdf, "Сводный_отчет.pdf", headers)
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(report: LDPRReport, request: Request):
+    try:
+        job = await jobs.submit(report)
+    except render_pool.QueueFull:
+        raise _queue_full()
+    return _job_response(job, request)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job, request)
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, request: Request):
+    job = await jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job, request)
+
+
+def _job_response(job, request):
+    response = job.to_dict()
+    response["url"] = None
+    if job.status == jobs.DONE:
+        response["url"] = f"{request.base_url}media/{job.output_name}"
+    return response
+
+
+def _pdf_response(pdf, filename, headers=None):
+    def chunks():
+        view = memoryview(pdf)
+        for start in range(0, len(view), PDF_CHUNK_SIZE):
+            yield view[start:start + PDF_CHUNK_SIZE]
+
+    disposition = f"attachment; filename=\"report.pdf\"; filename*=UTF-8''{quote(filename)}"
+    return StreamingResponse(
+        chunks(),
+        media_type="application/pdf",
+        headers={"Content-Length": str(len(pdf)), "Content-Disposition": disposition, **(headers or {})},
+    )
+
+
+def _deadline(request):
+    # Срок начала рендера: не позже RENDER_DEADLINE, клиент может попросить меньше
+    seconds = config.RENDER_DEADLINE
+    header = request.headers.get("x-render-deadline")
+    if header is not None:
+        try:
+            seconds = min(seconds, float(header))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="X-Render-Deadline must be a number of seconds")
+    return time.monotonic() + seconds
+
+
+async def _unless_disconnected(request, awaitable):
+    # Пока рендер ждёт очереди или идёт, проверяем соединение: пользователь мог
+    # закрыть вкладку или перезагрузить страницу. Тогда ожидание отменяется, и рендер,
+    # если его больше никто не ждёт, снимается с очереди.
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=config.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                # 499 как у nginx: ответ никто не получит, код нужен только для логов
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        task.cancel()
+
+
+def _queue_full():
+    return HTTPException(
+        status_code=503,
+        detail="Render queue is full, try again later",
+        headers={"Retry-After": str(config.RENDER_RETRY_AFTER)},
+    )
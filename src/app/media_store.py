@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+from fastapi import Response
+from fastapi.responses import FileResponse
+
+from app import config
+
+
+logger = logging.getLogger(__name__)
+
+REPORT_NAME_RE = re.compile(r"^report_[0-9a-f-]+\.pdf$")
+CHART_NAME_RE = re.compile(r"^chart_[0-9a-f-]+\.png$")
+PART_NAME_RE = re.compile(r"^report_[0-9a-f-]+\.pdf\.[0-9a-f]+\.part$")
+
+
+class MediaStore:
+    # Каталог готовых PDF с учётом размера и возраста файлов. Фоновая очистка
+    # удаляет файлы старше ttl, затем давно не скачанные, пока объём больше max_bytes.
+
+    def __init__(self, directory, max_bytes, ttl, tmp_directory, tmp_max_age):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.tmp_directory = tmp_directory
+        self.tmp_max_age = tmp_max_age
+        self.evicted = 0
+        self._files = {}  # имя -> (размер, mtime)
+        self._last_access = {}
+        self._bytes = 0
+        # Индекс трогают и event loop, и поток очистки
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def new_name(self):
+        return f"report_{uuid.uuid4()}.pdf"
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def part_path(self, name):
+        # Куда пишется будущий файл name: под своим именем он появится только целиком
+        # (os.replace), а брошенный недописанный файл удалит очистка
+        return self.path(f"{name}.{uuid.uuid4().hex}.part")
+
+    def add(self, name):
+        stat = os.stat(self.path(name))
+        entry = (stat.st_size, stat.st_mtime)
+        with self._lock:
+            self._forget(name)
+            self._files[name] = entry
+            self._bytes += entry[0]
+        return entry
+
+    def response(self, name, if_none_match=None):
+        if not REPORT_NAME_RE.match(name):
+            return None
+        with self._lock:
+            entry = self._files.get(name)
+        if entry is None:
+            try:
+                entry = self.add(name)
+            except FileNotFoundError:
+                return None
+        size, mtime = entry
+        etag = f'"{size:x}-{int(mtime * 1000):x}"'
+        with self._lock:
+            self._last_access[name] = time.time()
+        headers = {"ETag": etag, "Cache-Control": "private, max-age=3600"}
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        if not os.path.exists(self.path(name)):
+            with self._lock:
+                self._forget(name)
+            return None
+        return FileResponse(self.path(name), media_type="application/pdf", headers=headers)
+
+    def stats(self):
+        with self._lock:
+            return {"files": len(self._files), "bytes": self._bytes, "evicted": self.evicted}
+
+    def cleanup(self):
+        # Выполняется в потоке (asyncio.to_thread), а response() и add() — в event loop:
+        # каталог читается и файлы удаляются без блокировки, под ней только индекс
+        files = self._scan()
+        now = time.time()
+        with self._lock:
+            self._files = files
+            self._bytes = sum(size for size, _ in files.values())
+            self._last_access = {name: t for name, t in self._last_access.items() if name in files}
+            removed = [name for name, (_, mtime) in files.items() if now - mtime > self.ttl]
+            for name in removed:
+                self._forget(name)
+            if self._bytes > self.max_bytes:
+                by_access = sorted(self._files, key=lambda name: self._last_access.get(name, self._files[name][1]))
+                for name in by_access:
+                    if self._bytes <= self.max_bytes:
+                        break
+                    self._forget(name)
+                    removed.append(name)
+            self.evicted += len(removed)
+        for name in removed:
+            self._unlink(self.path(name))
+        self._clean_parts(now)
+        self._clean_tmp(now)
+
+    async def run_cleanup(self, interval):
+        while True:
+            try:
+                await asyncio.to_thread(self.cleanup)
+            except Exception:
+                logger.exception("Media cleanup failed")
+            await asyncio.sleep(interval)
+
+    def _scan(self):
+        # Файлы пишут процессы рендеринга и фоновые задачи, поэтому индекс
+        # периодически сверяется с каталогом
+        files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and REPORT_NAME_RE.match(entry.name):
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime)
+        return files
+
+    def _clean_parts(self, now):
+        # Недописанные файлы исполнителей, которые упали посреди рендера
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if PART_NAME_RE.match(entry.name) and now - entry.stat().st_mtime > self.ttl:
+                    self._unlink(entry.path)
+
+    def _clean_tmp(self, now):
+        if not os.path.isdir(self.tmp_directory):
+            return
+        with os.scandir(self.tmp_directory) as entries:
+            for entry in entries:
+                if CHART_NAME_RE.match(entry.name) and now - entry.stat().st_mtime > self.tmp_max_age:
+                    self._unlink(entry.path)
+
+    def _forget(self, name):
+        # Вызывается под self._lock
+        entry = self._files.pop(name, None)
+        if entry is not None:
+            self._bytes -= entry[0]
+        self._last_access.pop(name, None)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+media_store = MediaStore(
+    config.MEDIA_DIR,
+    config.MEDIA_MAX_BYTES,
+    config.MEDIA_TTL,
+    config.TMP_DIR,
+    config.TMP_MAX_AGE,
+)
@@ -0,0 +1,71 @@
+import os
+import resource
+import sys
+import tracemalloc
+
+
+# Память процесса-воркера. Пиковый RSS за один рендер берётся из /proc (Linux):
+# перед рендером пик сбрасывается через clear_refs. Если сбросить нельзя,
+# пиком считается максимум за всю жизнь процесса.
+
+TRACEMALLOC_FRAMES = 10
+TRACEMALLOC_TOP = 10
+
+_previous_snapshot = None
+
+
+def _status(field):
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss():
+    return _status("VmRSS:")
+
+
+def peak_rss():
+    peak = _status("VmHWM:")
+    if peak is None:
+        # ru_maxrss в килобайтах на Linux и в байтах на macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            peak *= 1024
+    return peak
+
+
+def reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def start_tracing():
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+
+def log_growth():
+    # Что прибавилось в куче Python с прошлого рендера — искать, кто копит память
+    global _previous_snapshot
+    if not tracemalloc.is_tracing():
+        return
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ))
+    if _previous_snapshot is not None:
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"[tracemalloc pid {os.getpid()}] current {current / 1024 / 1024:.1f} MB, peak {peak / 1024 / 1024:.1f} MB"]
+        for diff in snapshot.compare_to(_previous_snapshot, "lineno")[:TRACEMALLOC_TOP]:
+            lines.append(f"  {diff}")
+        print("\n".join(lines), file=sys.stderr)
+    _previous_snapshot = snapshot
+    tracemalloc.reset_peak()
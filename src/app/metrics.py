@@ -0,0 +1,241 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from app import config, memory
+
+
+logger = logging.getLogger(__name__)
+if config.TIMING_LOG:
+    # uvicorn не настраивает логгеры приложения, без своего обработчика INFO не попадёт в вывод
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+    logger.propagate = False
+
+# Границы гистограммы полного времени рендера (секунды)
+RENDER_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 30, 60)
+# Границы гистограммы размера готового PDF (байты)
+PDF_SIZE_BUCKETS = tuple(kb * 1024 for kb in (100, 250, 500, 1024, 2048, 5120, 10240))
+
+# Стадии текущего рендера в процессе-воркере: {стадия: секунды}.
+# chart, html, layout и write идут друг за другом; matplotlib — часть chart, morphology — часть html.
+_stages = {}
+_counters = {}
+
+# Агрегаты главного процесса, отдаются на /metrics
+_totals = {
+    "renders": 0,
+    "failures": 0,
+    "pdf_bytes": 0,
+    "images": 0,
+    "queue_wait_seconds": 0.0,
+    "queue_wait_count": 0,
+    "job_queue_wait_seconds": 0.0,
+    "job_queue_wait_count": 0,
+}
+_stage_seconds = {}
+_stage_count = {}
+_render_buckets = [0] * (len(RENDER_BUCKETS) + 1)
+_render_seconds = 0.0
+_pdf_size_buckets = [0] * (len(PDF_SIZE_BUCKETS) + 1)
+_pdf_size_count = 0
+# Допуск к рендеру: отказано из-за полной очереди (или вытеснено более срочным),
+# не начато до срока, снято с очереди после ухода клиента
+_admission = {"shed": 0, "expired": 0, "cancelled": 0}
+# Кэши полос диаграммы и словоформ: попадания и промахи в воркерах, сложенные из приращений за рендер
+_caches = {"chart_cache_hits": 0, "chart_cache_misses": 0, "morph_cache_hits": 0, "morph_cache_misses": 0}
+# Память воркеров: максимум пикового RSS за рендер и сколько раз пул перезапускался
+_memory = {"peak_rss": 0, "recycles": 0}
+# Старт сервиса: максимум по воркерам для импорта и прогрева, общее время до готовности
+_boot = {}
+
+
+@contextmanager
+def stage(name):
+    # Два вызова perf_counter и сложение в словаре — столько стоит замер, если /metrics никто не читает
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stages[name] = _stages.get(name, 0.0) + time.perf_counter() - started
+
+
+def count(name, value=1):
+    _counters[name] = _counters.get(name, 0) + value
+
+
+def collect(func, args, submitted_at):
+    # Выполняется в воркере: вместе с результатом возвращает замеры этого рендера
+    queue_wait = max(0.0, time.time() - submitted_at)
+    _stages.clear()
+    _counters.clear()
+    memory.reset_peak()
+    caches = cache_counts()
+    started = time.perf_counter()
+    result = func(*args)
+    stats = {
+        "pid": os.getpid(),
+        "queue_wait": queue_wait,
+        "seconds": time.perf_counter() - started,
+        "stages": dict(_stages),
+        "counters": dict(_counters),
+        "caches": {name: value - caches[name] for name, value in cache_counts().items()},
+        "rss": memory.rss(),
+        "peak_rss": memory.peak_rss(),
+    }
+    memory.log_growth()
+    return result, stats
+
+
+def cache_counts():
+    # Накопленные попадания и промахи кэшей этого процесса
+    from app import morphology
+    from app.chart_cache import bar_cache
+
+    chart = bar_cache.stats()
+    morph = morphology.cache_stats().values()
+    return {
+        "chart_cache_hits": chart["hits"],
+        "chart_cache_misses": chart["misses"],
+        "morph_cache_hits": sum(info["hits"] for info in morph),
+        "morph_cache_misses": sum(info["misses"] for info in morph),
+    }
+
+
+def _observe(buckets, bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            buckets[i] += 1
+            return
+    buckets[-1] += 1
+
+
+def _histogram(name, bounds, buckets, total, count):
+    lines = [f"# TYPE {name} histogram"]
+    cumulative = 0
+    for bound, bucket in zip(bounds, buckets):
+        cumulative += bucket
+        lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{le="+Inf"}} {cumulative + buckets[-1]}')
+    lines.append(f"{name}_sum {total}")
+    lines.append(f"{name}_count {count}")
+    return lines
+
+
+def record(stats):
+    global _render_seconds, _pdf_size_count
+    _totals["renders"] += 1
+    _totals["pdf_bytes"] += stats["counters"].get("pdf_bytes", 0)
+    _totals["images"] += stats["counters"].get("images", 0)
+    _memory["peak_rss"] = max(_memory["peak_rss"], stats["peak_rss"] or 0)
+    for name, value in stats["caches"].items():
+        _caches[name] += value
+    observe_queue_wait(stats["queue_wait"])
+    for name, seconds in stats["stages"].items():
+        _stage_seconds[name] = _stage_seconds.get(name, 0.0) + seconds
+        _stage_count[name] = _stage_count.get(name, 0) + 1
+
+    seconds = stats["seconds"]
+    _render_seconds += seconds
+    _observe(_render_buckets, RENDER_BUCKETS, seconds)
+    # Размер считается у рендеров, которые выдают готовый PDF (части большого отчёта — нет)
+    if "pdf_bytes" in stats["counters"]:
+        _pdf_size_count += 1
+        _observe(_pdf_size_buckets, PDF_SIZE_BUCKETS, stats["counters"]["pdf_bytes"])
+
+    if config.TIMING_LOG:
+        logger.info(json.dumps({
+            "event": "render",
+            "seconds": round(seconds, 4),
+            "queue_wait": round(stats["queue_wait"], 4),
+            "pid": stats["pid"],
+            "rss": stats["rss"],
+            "peak_rss": stats["peak_rss"],
+            "stages": {name: round(value, 4) for name, value in stats["stages"].items()},
+            **stats["counters"],
+        }))
+
+
+def record_failure():
+    _totals["failures"] += 1
+
+
+def record_admission(kind):
+    _admission[kind] += 1
+
+
+def record_recycle():
+    _memory["recycles"] += 1
+
+
+def observe_queue_wait(seconds):
+    _totals["queue_wait_seconds"] += seconds
+    _totals["queue_wait_count"] += 1
+
+
+def observe_job_queue_wait(seconds):
+    _totals["job_queue_wait_seconds"] += seconds
+    _totals["job_queue_wait_count"] += 1
+
+
+def record_boot(worker_timings, startup_seconds):
+    timings = [t for t in worker_timings if t]
+    for name in ("import_seconds", "warmup_seconds"):
+        if timings:
+            _boot[f"ldpr_worker_{name}"] = max(t[name] for t in timings)
+    _boot["ldpr_startup_seconds"] = startup_seconds
+
+
+def render_text(counters=(), gauges=()):
+    # Текстовый формат Prometheus; counters и gauges — пары (имя, значение) от других модулей
+    lines = [
+        "# TYPE ldpr_renders_total counter",
+        f"ldpr_renders_total {_totals['renders']}",
+        "# TYPE ldpr_render_failures_total counter",
+        f"ldpr_render_failures_total {_totals['failures']}",
+        "# TYPE ldpr_pdf_bytes_total counter",
+        f"ldpr_pdf_bytes_total {_totals['pdf_bytes']}",
+        "# TYPE ldpr_chart_images_total counter",
+        f"ldpr_chart_images_total {_totals['images']}",
+        "# TYPE ldpr_queue_wait_seconds summary",
+        f"ldpr_queue_wait_seconds_sum {_totals['queue_wait_seconds']:.6f}",
+        f"ldpr_queue_wait_seconds_count {_totals['queue_wait_count']}",
+        "# TYPE ldpr_job_queue_wait_seconds summary",
+        f"ldpr_job_queue_wait_seconds_sum {_totals['job_queue_wait_seconds']:.6f}",
+        f"ldpr_job_queue_wait_seconds_count {_totals['job_queue_wait_count']}",
+        "# TYPE ldpr_render_shed_total counter",
+        f"ldpr_render_shed_total {_admission['shed']}",
+        "# TYPE ldpr_render_expired_total counter",
+        f"ldpr_render_expired_total {_admission['expired']}",
+        "# TYPE ldpr_render_cancelled_total counter",
+        f"ldpr_render_cancelled_total {_admission['cancelled']}",
+        "# TYPE ldpr_worker_recycles_total counter",
+        f"ldpr_worker_recycles_total {_memory['recycles']}",
+        "# TYPE ldpr_render_peak_rss_bytes gauge",
+        f"ldpr_render_peak_rss_bytes {_memory['peak_rss']}",
+    ]
+    # Воркеры рендера плюс сам процесс API: /preview рисует диаграмму и склоняет слова здесь же
+    own = cache_counts()
+    for name, value in _caches.items():
+        lines.append(f"# TYPE ldpr_{name}_total counter")
+        lines.append(f"ldpr_{name}_total {value + own[name]}")
+    lines.append("# TYPE ldpr_stage_seconds summary")
+    for name in sorted(_stage_seconds):
+        lines.append(f'ldpr_stage_seconds_sum{{stage="{name}"}} {_stage_seconds[name]:.6f}')
+        lines.append(f'ldpr_stage_seconds_count{{stage="{name}"}} {_stage_count[name]}')
+
+    lines += _histogram(
+        "ldpr_render_seconds", RENDER_BUCKETS, _render_buckets, f"{_render_seconds:.6f}", _totals["renders"]
+    )
+    lines += _histogram(
+        "ldpr_pdf_size_bytes", PDF_SIZE_BUCKETS, _pdf_size_buckets, _totals["pdf_bytes"], _pdf_size_count
+    )
+
+    gauges = (*gauges, *((name, f"{value:.3f}") for name, value in _boot.items()))
+    for kind, values in (("counter", counters), ("gauge", gauges)):
+        for name, value in values:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
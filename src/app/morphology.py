@@ -0,0 +1,69 @@
+import functools
+
+from app import config, metrics
+
+
+# Формы существительного после числительного: 1 / 2-4 / 5 и больше
+PLURAL_FORMS = {
+    "прием": ("прием", "приема", "приемов"),
+    "ответ": ("ответ", "ответа", "ответов"),
+    "запрос": ("запрос", "запроса", "запросов"),
+    "обращение": ("обращение", "обращения", "обращений"),
+    "законопроект": ("законопроект", "законопроекта", "законопроектов"),
+    "депутат": ("депутат", "депутата", "депутатов"),
+    "встреча": ("встречу", "встречи", "встреч"),
+    # "присутствовал на N из M заседаний"
+    "заседание": ("заседания", "заседаний", "заседаний"),
+}
+
+_analyzer = None
+
+
+def get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        # Словари pymorphy3 загружаются только когда нужны (процесс API их не трогает)
+        import pymorphy3
+        _analyzer = pymorphy3.MorphAnalyzer()
+    return _analyzer
+
+
+def warm_up():
+    # Словари OpenCorpora загружаются один раз на процесс
+    get_analyzer()
+    for word, grammemes in (("достижение", ("nomn", "sing")), ("достижения", ("nomn", "plur"))):
+        inflect(word, frozenset(grammemes))
+
+
+@functools.lru_cache(maxsize=config.MORPH_CACHE_SIZE)
+def inflect(word, grammemes):
+    # Замеряется только промах кэша — именно он обращается к pymorphy3
+    with metrics.stage("morphology"):
+        inflected = get_analyzer().parse(word)[0].inflect(set(grammemes))
+    return inflected.word if inflected else word
+
+
+def plural_index(count):
+    count_mod_10 = count % 10
+    count_mod_100 = count % 100
+    if count_mod_10 == 1 and count_mod_100 != 11:
+        return 0
+    if count_mod_10 in (2, 3, 4) and count_mod_100 not in (12, 13, 14):
+        return 1
+    return 2
+
+
+@functools.lru_cache(maxsize=config.MORPH_CACHE_SIZE)
+def declense_noun(noun, count):
+    forms = PLURAL_FORMS.get(noun)
+    if forms is None:
+        return noun
+    return forms[plural_index(count)]
+
+
+def cache_stats():
+    stats = {}
+    for name, func in (("inflect", inflect), ("declense_noun", declense_noun)):
+        info = func.cache_info()
+        stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+    return stats
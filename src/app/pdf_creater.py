@@ -1,130 +1,81 @@
-from weasyprint import HTML
+import io
 import json
-import pymorphy3
 import os
+import time
 import uuid
 import pathlib
-import matplotlib.pyplot as plt
-import matplotlib.transforms as mtrans
+
+from app import config, metrics
+from app.chart_cache import bar_cache
+from app.charts import CHART_CATEGORIES, render_svg_chart
+from app.report_template import (
+    render_chunk_document,
+    render_citizen_requests,
+    render_document,
+    render_footer_document,
+    render_general_info,
+    render_ldpr_orders,
+    render_legislation,
+    render_other_info,
+    render_project_activity,
+    render_svo_support,
+)
+from app.styles import (
+    get_chunk_stylesheets,
+    get_font_config,
+    get_footer_stylesheets,
+    get_stylesheets,
+    inline_styles,
+)
+from app.model import LDPRReport, Requests
+from app.report_ir import from_model
+
+# weasyprint, matplotlib и pymorphy3 импортируются при первом использовании:
+# процесс API и перезапуск по --reload их не загружают, воркеры прогреваются в warm_up
+
+# Меняется при любом изменении вёрстки: от неё зависят ключи кэша готовых PDF
+TEMPLATE_VERSION = "2025-autumn.3"
+
+# Профили вывода PDF (config.PDF_PROFILE): от быстрой записи к маленькому файлу.
+# dpi — предел плотности растровых картинок в PDF, более плотные WeasyPrint уменьшает;
+# chart_dpi — плотность самих полос PNG-диаграммы; dedupe — склейка одинаковых объектов
+# (шрифтов, декора шапки) в PDF, собранных из нескольких документов.
+PDF_PROFILES = {
+    "speed": {"full_fonts": True, "optimize_images": False, "dpi": None, "chart_dpi": 300, "dedupe": False},
+    "balanced": {"full_fonts": False, "optimize_images": False, "dpi": 150, "chart_dpi": 150, "dedupe": False},
+    "size": {"full_fonts": False, "optimize_images": True, "dpi": 100, "chart_dpi": 120, "dedupe": True},
+}
+if config.PDF_PROFILE not in PDF_PROFILES:
+    raise ValueError(f"PDF_PROFILE must be one of: {', '.join(PDF_PROFILES)}")
+PDF_PROFILE = {
+    **PDF_PROFILES[config.PDF_PROFILE],
+    **({"dpi": config.PDF_DPI or None} if config.PDF_DPI is not None else {}),
+    **({"chart_dpi": config.CHART_DPI} if config.CHART_DPI is not None else {}),
+}
+
+# Картинки, уже разобранные WeasyPrint, по URL: декор шапки и повторяющиеся полосы
+# не декодируются заново в каждом рендере. Чистится целиком между рендерами при переполнении.
+IMAGE_CACHE_ENTRIES = 256
+_image_cache = {}
 
 def load_json_data(filename):
     with open(filename, 'r', encoding='utf-8') as file:
         return json.load(file)
 
-def delete_dot(string):
-    if not string or string[-1] != ".":
-        return string
-    return string[:-1]
-
-def declense_noun(noun, count):
-    if isinstance(count, str):
-        try:
-            count = int(count)
-        except ValueError:
-            count = 0
-    count_mod_10 = count % 10
-    count_mod_100 = count % 100
-    if noun == "прием":
-        if count_mod_10 == 1 and count_mod_100 != 11:
-            return "прием"
-        elif count_mod_10 in [2, 3, 4] and count_mod_100 not in [12, 13, 14]:
-            return "приема"
-        else:
-            return "приемов"
-    elif noun == "ответ":
-        if count_mod_10 == 1 and count_mod_100 != 11:
-            return "ответ"
-        elif count_mod_10 in [2, 3, 4] and count_mod_100 not in [12, 13, 14]:
-            return "ответа"
-        else:
-            return "ответов"
-    elif noun == "запрос":
-        if count_mod_10 == 1 and count_mod_100 != 11:
-            return "запрос"
-        elif count_mod_10 in [2, 3, 4] and count_mod_100 not in [12, 13, 14]:
-            return "запроса"
-        else:
-            return "запросов"
-    elif noun == "обращение":
-        if count_mod_10 == 1 and count_mod_100 != 11:
-            return "обращение"
-        elif count_mod_10 in [2, 3, 4] and count_mod_100 not in [12, 13, 14]:
-            return "обращения"
-        else:
-            return "обращений"
-    elif noun == "законопроект":
-        if count_mod_10 == 1 and count_mod_100 != 11:
-            return "законопроект"
-        elif count_mod_10 in [2, 3, 4] and count_mod_100 not in [12, 13, 14]:
-            return "законопроекта"
-        else:
-            return "законопроектов"
-    elif noun == "встреча":
-        if count_mod_10 == 1 and count_mod_100 != 11:
-            return "встречу"
-        elif count_mod_10 in [2, 3, 4] and count_mod_100 not in [12, 13, 14]:
-            return "встречи"
-        else:
-            return "встреч"
-    return noun
-
-def generate_bar_chart(data):
-    output_paths = []
-    # Prepare and sort data
-    categories = {
-        "ЖКХ": data['citizen_requests']['requests'].get('utilities', 0),
-        "Пенсии и выплаты": data['citizen_requests']['requests'].get('pensions_and_social_payments', 0),
-        "Благоустройство": data['citizen_requests']['requests'].get('improvement', 0),
-        "Образование": data['citizen_requests']['requests'].get('education', 0),
-        "СВО": data['citizen_requests']['requests'].get('svo', 0),
-        "Дороги": data['citizen_requests']['requests'].get('road_maintenance', 0),
-        "Экология": data['citizen_requests']['requests'].get('ecology', 0),
-        "Медицина": data['citizen_requests']['requests'].get('medicine_and_healthcare', 0),
-        "Транспорт": data['citizen_requests']['requests'].get('public_transport', 0),
-        "Несанкционированные \nсвалки": data['citizen_requests']['requests'].get('illegal_dumps', 0),
-#        "Обращение\nк Председателю ЛДПР": data['citizen_requests']['requests'].get('appeals_to_ldpr_chairman', 0),
-        "Юридическая помощь": data['citizen_requests']['requests'].get('legal_aid_requests', 0),
-        "Развитие территорий": data['citizen_requests']['requests'].get('integrated_territory_development', 0),
-        "Бесхозяйные животные  ": data['citizen_requests']['requests'].get('stray_animal_issues', 0),
-        "Законодательные \nпредложения": data['citizen_requests']['requests'].get('legislative_proposals', 0)
-    }
-    
-    # Найти максимальную длину строки с учётом переносов
-    max_key_length = 0
-    for key in categories.keys():
-        lines = key.split('\n')
-        max_line_length = max(len(line) for line in lines)
-        max_key_length = max(max_key_length, max_line_length)
-
-    # Дополнить пробелами каждую строку категории
-    new_categories = {}
-    for key, value in categories.items():
-        lines = key.split('\n')
-        padded_lines = [line.rstrip() + " " * (max_key_length - len(line.rstrip())) for line in lines]
-        new_key = "\n".join(padded_lines)
-        new_categories[new_key] = value
-    categories = new_categories
-
-    # Convert to integers and filter zero values
-    categories = {k: int(v) if str(v).isdigit() else 0 for k, v in categories.items()}
-    max_value = max(categories.values()) if categories.values() else 10  # Default max for empty data
-    sorted_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)
-
-    for category, count in sorted_categories:
-        if count == 0:
-            continue
-        chart_filename = f"tmp/chart_{uuid.uuid4()}.png"
-        chart_abs_path = str(pathlib.Path.cwd() / chart_filename)
-        output_paths.append(chart_abs_path)
+def render_bar_png(category, count, max_value):
+    import matplotlib.pyplot as plt
+    import matplotlib.transforms as mtrans
 
-        labels = [category]
-        values = [count]
+    labels = [category]
+    values = [count]
 
-        # Colors setup
-        colors = ['#394B8C']
+    # Colors setup
+    colors = ['#394B8C']
 
-        # Create figure with dynamic size, учитывая количество строк
-        fig, ax = plt.subplots(figsize=(10, 0.4))
+    # Create figure with dynamic size, учитывая количество строк
+    fig, ax = plt.subplots(figsize=(10, 0.4))
+    # Фигура закрывается и при ошибке: иначе pyplot держит её до конца жизни воркера
+    try:
         ax.set_xlim([0.2, max_value * 1.1])
         # Create horizontal bars
         bars = ax.barh(labels, values, color=colors, height=0.6, edgecolor=colors, linewidth=2)
@@ -159,365 +110,261 @@ def generate_bar_chart(data):
                     bbox=dict(boxstyle='square,pad=0', edgecolor='none', facecolor='none', linewidth=0))
             ax.axhline(y=i-0.3, xmin=-0.64, xmax=0.1, color=color, linewidth=2, clip_on=False)
 
-        plt.subplots_adjust(left=0.3, right=0.9, top=0.9, bottom=0.1)
-        try:
-            plt.savefig(chart_abs_path, dpi=300, bbox_inches='tight', transparent=True)
-            plt.close()
-        except Exception as e:
-            print(f"Error saving chart image: {e}")
-            raise
-    return output_paths, sum(categories.values())
-
-
-def generate_html_report(data):
-    morph = pymorphy3.MorphAnalyzer()
-
-    def format_list(items, singular, plural, case='nomn', item_format=lambda x: x):
-        if not items:
-            return f"не {plural}."
-        count = len(items)
-        if count == 1:
-            noun = morph.parse(singular)[0].inflect({case, 'sing'}).word
-            return f"{noun}: <ul class='list-disc pl-6'><li>{item_format(items[0])}</li></ul>"
-        else:
-            noun = morph.parse(plural)[0].inflect({case, 'plur'}).word
-            items_html = ''.join(f'<li class="mb-2">{item_format(item)}</li>' for item in items)
-            return f"{noun}: <ul class='list-disc pl-6'>{items_html}</ul>"
-
-    def just_list(items, head, item_format=lambda x: x):
-        if not items:
-            return
-        items_html = ''.join(f'<li class="mb-2 small">{item_format(item)}</li>' for item in items)
-        return f"{head}: <ul class='list-disc pl-6'>{items_html}</ul>"
-
-    # Format links
-    links_text = just_list(
-        data['general_info']['links'],
-        "Ссылки на ресурсы",
-        lambda x: f'<a href="{x}" class="text-ldpr-blue">{x}</a>'
-    ) if data['general_info']['links'] and len(data['general_info']['links']) != 1 and data['general_info']['links'][0] else ""
-    committees_text = ''.join(f'<li class="mb-2 small">{item}</li>' for item in data['general_info']['committees'])
-    committees_text = f"<ul class='list-disc pl-6'>{committees_text}</ul>"
-    committees_text = f"<p>Комитеты и комиссии, в которых состоит:</p> {committees_text}" if data['general_info']['committees'] and len(data['general_info']['committees']) != 1 and data['general_info']['committees'][0] else ""
-    # Format legislation
-    legislation_text = ""
-    count = len(data['legislation'])
-    if count == 0:
-        legislation_text = "законопроекты за отчетный период не вносились."
-    else:
-        legislation_items = [
-            f'<li class="mb-2"><strong>«{item["title"].strip()}»</strong>: {delete_dot(item["summary"].strip())}. '
-            f'<span>Статус: {item["status"]}.</span>'
-            f'{"" if "rejection_reason" not in item or not item["rejection_reason"] else f" Причина отклонения: {delete_dot(item['rejection_reason'])}."}</li>'
-            for item in data['legislation']
-        ]
-        noun = "законопроект" if count == 1 else "законопроекты"
-        local_noun = declense_noun("законопроект", count)
-
-        legislation_text = f"Внёс {count} {local_noun} из которых принято — {sum(1 for item in data['legislation'] if item['status'].startswith('Принято'))}, отклонено — {sum(1 for item in data['legislation'] if item['status'] == 'Отклонено')}."
-        # legislation_text = f"Внесено по инициативе ЛДПР — {sum(1 for item in data['legislation'] if item['status'] == 'внесено по инициативе ЛДПР')}, внесено межфракционно —  {sum(1 for item in data['legislation'] if item['status'] == 'внесено по инициативе ЛДПР')}. Из них принято по инициативе ЛДПР — {sum(1 for item in data['legislation'] if item['status'] == 'Принято по инициативе ЛДПР')}, принято межфракционно — {sum(1 for item in data['legislation'] if item['status'] == 'Принято межфракционно')}, отклонено — {sum(1 for item in data['legislation'] if item['status'] == 'Отклонен')}. "
-        legislation_text += f"<ul class='list-disc pl-6'>{''.join(legislation_items)}</ul>"
-
-    # Format citizen request examples
-    examples_text = format_list(
-        data['citizen_requests']['examples'],
-        "достижение",
-        "достижения",
-        'nomn',
-        lambda x: f'<span>{delete_dot(x["text"])}.</span>'
-    )
+        fig.subplots_adjust(left=0.3, right=0.9, top=0.9, bottom=0.1)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=PDF_PROFILE["chart_dpi"], bbox_inches='tight', transparent=True)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
 
-    # Format project activities
-    project_activity_text = ""
-    count = len(data['project_activity'])
-    if count == 0:
-        project_activity_text = "проекты и мероприятия за отчетный период не проводились."
-    else:
-        project_items = [
-            f'<li class="mb-2"><strong>«{item["name"].strip()}»</strong>: {delete_dot(item["result"].strip())}.</li>'
-            for item in data['project_activity']
-        ]
-        proj_noun = "проект" if count == 1 else "проектов"
-        event_noun = "мероприятие" if count == 1 else "мероприятий"
-        project_activity_text = f"<ul class='list-disc pl-6'>{''.join(project_items)}</ul>"
-
-    # Format LDPR orders
-    ldpr_orders_text = ""
-    count = len(data['ldpr_orders'])
-    if count == 0:
-        ldpr_orders_text = "поручения Председателя ЛДПР за отчетный период отсутствуют."
-    else:
-        order_items = [
-            f'<li class="mb-2"><strong>«{item["instruction"].strip()}»</strong>: {delete_dot(item["action"].strip())}.</li>'
-            for item in data['ldpr_orders']
-        ]
-        noun = "поручение" if count == 1 else "поручений"
-        ldpr_orders_text = f"<ul class='list-disc pl-6'>{''.join(order_items)}</ul>"
-
-    # Format SVO support projects (исправлено для работы с dict)
-    svo_support_text = ""
-    count = len(data['svo_support']['projects'])
-    if count == 0:
-        svo_support_text = "проекты по поддержке СВО за отчетный период не проводились."
-    else:
-        svo_items = [
-            f'<li class="mb-2">{delete_dot(item.get("text", "").strip())}.</li>'
-            for item in data['svo_support']['projects']
-            if item.get("text")
+
+def _pad_label(label, width):
+    return "\n".join(line.rstrip() + " " * (width - len(line.rstrip())) for line in label.split("\n"))
+
+
+# Подписи дополнены пробелами до самой длинной строки, чтобы полосы шли с одного края
+_LABEL_WIDTH = max(len(line) for label, _ in CHART_CATEGORIES for line in label.split("\n"))
+PADDED_LABELS = {label: _pad_label(label, _LABEL_WIDTH) for label, _ in CHART_CATEGORIES}
+
+
+def generate_bar_chart(requests):
+    # requests — report_ir.CitizenRequests: нули отброшены, строки отсортированы по убыванию
+    output_paths = []
+    max_value = requests.chart_max
+    for label, count in requests.chart_rows:
+        category = PADDED_LABELS[label]
+        chart_filename = os.path.join(config.TMP_DIR, f"chart_{uuid.uuid4()}.png")
+        chart_abs_path = str(pathlib.Path.cwd() / chart_filename)
+        output_paths.append(chart_abs_path)
+
+        cache_key = bar_cache.key(f"{PDF_PROFILE['chart_dpi']}dpi.png", category, count, max_value)
+        image = bar_cache.get(cache_key)
+        if image is None:
+            with metrics.stage("matplotlib"):
+                image = render_bar_png(category, count, max_value)
+            bar_cache.put(cache_key, image)
+        with open(chart_abs_path, "wb") as f:
+            f.write(image)
+    return output_paths
+
+
+def generate_html_report(report, period=None):
+    images_text, images_paths = render_chart(report.citizen_requests)
+    with metrics.stage("html"):
+        html_content = render_document(
+            report.general_info.full_name, period or config.REPORT_PERIOD, _render_sections(report, images_text)
+        )
+    return html_content, images_paths
+
+
+def generate_html_chunks(report, chunks, period=None):
+    # Большой отчёт режется по границам section-container: первая часть — с шапкой
+    images_text, images_paths = render_chart(report.citizen_requests)
+    with metrics.stage("html"):
+        groups = split_sections([s for s in _render_sections(report, images_text) if s], chunks)
+        documents = [
+            render_document(report.general_info.full_name, period or config.REPORT_PERIOD, groups[0]),
+            *(render_chunk_document(group) for group in groups[1:]),
         ]
-        noun = "проект" if count == 1 else "проектов"
-        svo_support_text = f"<ul class='list-disc pl-6'>{''.join(svo_items)}</ul>"
-
-    # Manual declension for заседание
-    def declense_zasedanie(count, prepositional=False):
-        if isinstance(count, str):
-            try:
-                count = int(count)
-            except ValueError:
-                count = 0
-        count_mod_10 = count % 10
-        count_mod_100 = count % 100
-        if count == 1:
-            return "заседания"
-        elif count_mod_10 == 1 and count != 11:
-            return "заседания"
+    return documents, images_paths
+
+
+def split_sections(sections, chunks):
+    # Подряд идущие секции делятся на части примерно равного объёма HTML
+    target = sum(len(section) for section in sections) / max(chunks, 1)
+    groups = [[]]
+    size = 0
+    for section in sections:
+        if groups[-1] and size >= target and len(groups) < chunks:
+            groups.append([])
+            size = 0
+        groups[-1].append(section)
+        size += len(section)
+    return groups
+
+
+def is_large_report(report):
+    return report.item_count >= config.LARGE_REPORT_ITEMS
+
+
+def render_chart(requests):
+    # requests — всё, у чего есть chart_rows и chart_max (report_ir.CitizenRequests, сводки rollup).
+    # Возвращает HTML диаграммы и PNG-файлы, которые надо удалить после вёрстки
+    with metrics.stage("chart"):
+        if config.CHART_FORMAT == "png":
+            images_paths = generate_bar_chart(requests)
+            images_text = "".join(f'<img src="file://{image_path}" style="max-width: 100%; height: auto;">' for image_path in images_paths)
         else:
-            return "заседаний"
-
-
-
-    sessions_total = declense_zasedanie(data['general_info']['sessions_attended']['total'])
-    committee_total = declense_zasedanie(data['general_info']['sessions_attended']['committee_total'])
-    ldpr_total = declense_zasedanie(data['general_info']['sessions_attended']['ldpr_total'])
-
-    personal_meetings = declense_noun("прием", data['citizen_requests']['personal_meetings'])
-    responses = declense_noun("ответ", data['citizen_requests']['responses'])
-    official_queries = declense_noun("запрос", data['citizen_requests']['official_queries'])
-
-    images_paths, requests_count = generate_bar_chart(data)
-    images_text = "".join(f'<img src="file://{image_path}" style="max-width: 100%; height: auto;">' for image_path in images_paths)
-    ldpr_requests_text = f"""
-    <p class="mt-4 big"><strong>Получено обращений на имя Председателя ЛДПР: <b>{data['citizen_requests']['requests'].get('appeals_to_ldpr_chairman', 0)}</b></strong></p>
-    """ if int(data['citizen_requests']['requests'].get('appeals_to_ldpr_chairman', 0)) > 0 else ""
-    meeting_noun = declense_noun("встреча", sum(data['citizen_requests']["citizen_day_receptions"].values()))
-    citizen_requests_text = f"""
-    <p class="mb-4">Депутат провел <strong>{data['citizen_requests']['personal_meetings']}</strong> личных {personal_meetings} граждан в том числе {sum(data['citizen_requests']["citizen_day_receptions"].values())} {meeting_noun} в рамках Всероссийского дня приема граждан. За отчетный период поступило множество письменных обращений, охватывающих различные темы:</p>
-    <div class="table-container">
-        {images_text}
-    </div>
-    {ldpr_requests_text}
-    <p class="mt-4">На обращения граждан было дано <strong>{data['citizen_requests']['responses']}</strong> {responses}, а также направлено <strong>{data['citizen_requests']['official_queries']}</strong> депутатских {official_queries} в органы власти и иные организации. Среди примеров успешной работы можно отметить {examples_text}</p>
-    """
-    while "\\n" in data['other_info']:
-        data['other_info'] = data['other_info'].replace("\\n", "<br>")
-
-    while "\n" in data['other_info']:
-        data['other_info'] = data['other_info'].replace("\n", "<br>")
-
-    other_info_text = f"""
-            <div class="section-container other_info">
-                <h3>7. ИНАЯ ЗНАЧИМАЯ ИНФОРМАЦИЯ</h3>
-                <div>
-                    <p>{delete_dot(data['other_info'].strip())}.</p>
-                </div>
-            </div>
-    """ if data['other_info'].strip() else ""
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="ru">
-    <head>
-        <meta charset="UTF-8">
-        <title>ОТЧЕТ ДЕЯТЕЛЬНОСТИ ДЕПУТАТА ЛДПР</title>
-        <link href="https://fonts.googleapis.com/css2?family=Geologica:wght@400;500;600&display=swap" rel="stylesheet">
-        <link href="https://fonts.googleapis.com/css2?family=Bebas+Neue&display=swap" rel="stylesheet">
-        <link href="https://cdnjs.cloudflare.com/ajax/libs/meyer-reset/2.0/reset.min.css" rel="stylesheet">
-        <style>
-            * {{ -webkit-font-smoothing: antialiased; box-sizing: border-box; }}
-            body {{ font-family: 'Geologica', sans-serif; font-size: 14px; line-height: 15.2px; color: #000000; background: #FFFFFF; margin: 0; height: 100%;
-            width: 21cm;}}
-            .big {{font-size: 18px}}
-            .container {{ width: 720px; margin: 0 auto; padding: 0 24px; margin-top: 40px; }}
-            .ldpr-yellow {{ background-color: #FFC531; }}
-            .ldpr-blue {{ color: #394B8C; }}
-            .text-ldpr-blue {{ color: #394B8C; text-decoration: underline; }}
-            .status-green {{ color: #097903; }}
-            .status-red {{ color: #FF0000; }}
-            .header {{
-                position: relative;
-                text-align: center;
-                background: #394B8C;
-                color: #FFFFFF;
-                margin-bottom: 12px;
-                border-radius: 0 0 20px 20px;
-                height: 171.4px; /* Фиксированная высота для согласованности */
-                padding-top: 20px;
-                padding-bottom: 20px;
-            }}             
-           .header-content {{
-                flex-grow: 1;
-                padding: 0 20px;
-                margin-right: 140px
-            }}
-            .header-content h1.first {{ font-family: 'Geologica', sans-serif; font-size: 44px; font-weight: 400; text-transform: uppercase; line-height: 44px; margin-bottom: 6px; font-weight: 700;}}
-            .header h1.second {{ font-family: 'Geologica', sans-serif; font-size: 44px; font-weight: 400; text-transform: uppercase; line-height: 44px; margin-bottom: 6px; font-weight: 700;}}
-            .header h2 {{ font-family: 'Geologica', sans-serif; font-weight: 600; font-size: 16px; line-height: 17px; margin-top: 8px;}}
-            .header p {{ font-family: 'Geologica', sans-serif; font-weight: 400; font-size: 12px; line-height: 14.4px; text-align: center; }}
-            .section-container {{ margin-bottom: 29px; position: relative; }}
-            h3 {{ font-family: 'Geologica', sans-serif; font-weight: 600; font-size: 26px; line-height: 22px; color: #000000; background: #ccd8e8; padding: 3px 0; margin-bottom: 20px; width: 100%; }}
-            h4 {{ text-align: center; }}
-            p {{ 
-                margin: 0 0 6px 0; 
-                # text-align: justify; 
-                font-family: 'Geologica',
-                sans-serif; font-weight: 400;
-                font-size: 14.0px; line-height: 15.2px; 
-            }}
-            ul.list-disc {{ margin: 7px 0 6px 0; padding-left: 20px; list-style: none; }}
-            ul.list-disc li {{ position: relative; padding-left: 20px; list-style-type: none; padding-bottom: 10px}}
-            ul.list-disc li.small {{ padding-bottom: 0px}}
-            ul.list-disc li::before {{
-  content: ''; 
-  background-image: url("data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNjYiIGhlaWdodD0iNjIiIHZpZXdCb3g9IjAgMCA2NiA2MyIgZmlsbD0ibm9uZSIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj4KPHBhdGggZD0iTTM1Ljk1NTYgMjcuOTQyM0w0MC4yOTg2IDAuMzgwODU5SDI1LjI2NTFMMjkuNjA4MSAyNy45NDIzTDQuNzE5MzEgMTUuNDE0NEwwLjA0MjIyMTM0IDI5LjYxMjdMMjcuNDM2NiAzNC4yODk4TDcuODkzMDUgNTMuODMzM0wxOS45MTk5IDYyLjY4NjRMMzIuNzgxOCAzNy45NjQ2TDQ1LjY0MzkgNjIuNjg2NEw1Ny42NzA3IDUzLjgzMzNMMzguMTI3MSAzNC4yODk4TDY1LjUyMTUgMjkuNjEyN0w2MC44NDQ0IDE1LjQxNDRMMzUuOTU1NiAyNy45NDIzWiIgZmlsbD0iIzNCODJGNiIvPgo8L3N2Zz4K"); 
-  background-repeat: no-repeat; 
-  background-size: contain; 
-  position: absolute; 
-  left: 0; 
-  width: 12px; 
-  height: 12px; 
-  top: 3px; 
-}}
-            .table-container {{ background: #EAF1F9; border-radius: 20px; margin: 15px 0; padding: 10px; padding-left: 20px; text-align: center; }}
-            strong {{ font-weight: 600; }}
-            b {{ font-weight: 900; }}
-            @page {{ size: A4; margin: 1cm 0cm 1cm 0cm; }}
-            @page :first {{ margin: 0cm 0cm 1cm 0cm; }}
-            @page {{ @bottom-right {{ content: counter(page) " / " counter(pages); font-family: 'Geologica', sans-serif; border-top-left-radius: 6px; font-size: 10px; color: #FFFFFF; background: #394B8C; height: 20px; line-height: 0px; padding-left: 8px; padding-right: 8px; text-align: center; margin-top: 20px; }} }}
-.header-decoration {{
-    position: absolute;
-    top: 0;
-    width: 171.4px;
-    height: 171.4px;
-}}
-.header-decoration.left {{
-    left: 0;
-}}
-.header-decoration.right {{
-    right: 0;
-}}
-.header-decoration img {{
-    height: 100%;
-    width: 100%;
-    display: block; /* Убирает возможные отступы */
-}}
-.header-decoration.left img {{
-    border-radius: 0 0 0 20px;
-}}
-
-.header-decoration.right img {{
-    border-radius: 0 0 20px 0;
-}}
-
-.header-content {{
-}}
-        </style>
-    </head>
-    <body>
-<div class="header">
-    <div class="header-decoration left"></div>
-    <div class="header-decoration right">
-        <img src="data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNTQwIiBoZWlnaHQ9IjU0MCIgdmlld0JveD0iMCAwIDU0MCA1NDAiIGZpbGw9Im5vbmUiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyI+PGcgY2xpcC1wYXRoPSJ1cmwoI2NsaXAwXzIwNjZfMzY2KSI+PHBhdGggZD0iTTAgMzkwQzAgMzIzLjcyNiA1My43MjU4IDI3MCAxMjAgMjcwSDI3MFY1NDBIMFYzOTBaIiBmaWxsPSIjQ0NEOEU4Ii8+PHBhdGggZD0iTTI3MCAxMjBDMjcwIDIwMi84NDMgMzM3LjE1NyAyNzAgNDIwIDI3MEg1NDBWMEgyNzBWMTIwWiIgZmlsbD0iIzM5NEI4QyIvPjxwYXRoIGQ9Ik01NDAgNTQwVjI3MEgyNzBWNTQwSDU0MFoiIGZpbGw9IiNGRkM1MzEiLz48cGF0aCBmaWxsLXJ1bGU9ImV2ZW5vZGQiIGNsaXAtcnVsZT0iZXZlbm9kZCIgZD0iTTI3MCA0NDlDMjcwIDM1MC4xNDEgMTg5Ljg1OSAyNzAgOTEgMjcwQzE4OS44NTkgMjcwIDI3NCAxODkuODU5IDI3MCA5MUMyNzAgMTg5Ljg1OSAzNTAuMTQxIDI3NCA0NDkgMjcwQzM1MC4xNDEgMjcwIDI3NCAzNTAuMTQxIDI3MCA0NDlaIiBmaWxsPSJ3aGl0ZSIvPjwvZz48ZGVmcz48Y2xpcFBhdGggaWQ9ImNsaXAwXzIwNjZfMzY2Ij48cmVjdCB3aWR0aD0iNTQwIiBoZWlnaHQ9IjU0MCIgZmlsbD0id2hpdGUiLz48L2NsaXBQYXRoPjwvZGVmcz48L3N2Zz4=" alt="Right decoration">
-    </div>
-    <div class="header-content">
-        <h1 class="first">ОТЧЕТ О ПРОДЕЛАННОЙ</h1> 
-        <h1 class="second">РАБОТЕ ДЕПУТАТА ЛДПР</h1>
-        <h2>{data['general_info']['full_name']}</h2>
-        <p>по итогам осенней сессии 2025 года</p>
-    </div>
-</div>
-
-        <div class="container">
-            <div class="section-container">
-                <h3>1. ОБЩАЯ ИНФОРМАЦИЯ</h3>
-                <div>
-                    <p>ФИО: <strong>{data['general_info']['full_name']}</strong></p>
-                    <p>Избирательный округ: {data['general_info']['district'].strip()}</p>
-                    <p>Субъект Российской Федерации: {data['general_info']['region'].strip()}</p>
-                    <p>Представительный орган власти: {data['general_info']['authority_name'].strip()}</p>
-                    <p>Срок полномочий: {data['general_info']['term_start']} - {data['general_info']['term_end']}</p>
-                    <p>Должность: {data['general_info']['position']}</p>
-                    <p>Должность во фракции ЛДПР: {data['general_info']['ldpr_position']}</p>
-                    {committees_text}
-                    <p class="mb-4">Участие в заседаниях:</p>
-                    <ul class="list-disc">
-                        <li class="small">Заседания органа власти: присутствовал на {data['general_info']['sessions_attended']['attended']} из {data['general_info']['sessions_attended']['total']} {sessions_total}.</li>
-                        <li class="small">Заседания комитетов: присутствовал на {data['general_info']['sessions_attended']['committee_attended']} из {data['general_info']['sessions_attended']['committee_total']} {committee_total}.</li>
-                        <li class="small">Заседания фракции ЛДПР: присутствовал на {data['general_info']['sessions_attended']['ldpr_attended']} из {data['general_info']['sessions_attended']['ldpr_total']} {ldpr_total}.</li>
-                    </ul>
-                    {links_text}
-                </div>
-            </div>
-
-            <div class="section-container">
-                <h3>2. ЗАКОНОТВОРЧЕСКАЯ ДЕЯТЕЛЬНОСТЬ</h3>
-                <div>
-                    <p>{legislation_text}</p>
-                </div>
-            </div>
-
-            <div class="section-container">
-                <h3>3. РАБОТА С ОБРАЩЕНИЯМИ ГРАЖДАН</h3>
-                <div>
-                    {citizen_requests_text}
-                </div>
-            </div>
-
-            <div class="section-container">
-                <h3>4. ПОДДЕРЖКА УЧАСТНИКОВ СВО И ИХ СЕМЕЙ</h3>
-                <div>
-                    <p>{svo_support_text}</p>
-                </div>
-            </div>
-
-            <div class="section-container">
-                <h3>5. ПРЕДСТАВИТЕЛЬСКАЯ И ПРОЕКТНАЯ ДЕЯТЕЛЬНОСТЬ</h3>
-                <div>
-                    <p>{project_activity_text}</p>
-                </div>
-            </div>
-
-            <div class="section-container">
-                <h3>6. РАБОТА ПО ПОРУЧЕНИЯМ ПРЕДСЕДАТЕЛЯ ЛДПР</h3>
-                <div>
-                    <p>{ldpr_orders_text}</p>
-                </div>
-            </div>
-            {other_info_text}
-        </div>
-    </body>
-    </html>
-    """
+            images_paths = []
+            images_text = render_svg_chart(requests)
+    metrics.count("images", len(images_paths))
+    return images_text, images_paths
+
+
+def _render_sections(report, images_text):
+    return [
+        render_general_info(report.general_info),
+        render_legislation(report.legislation, report.legislation_accepted, report.legislation_rejected),
+        render_citizen_requests(report.citizen_requests, images_text),
+        render_svo_support(report.svo_projects),
+        render_project_activity(report.project_activity),
+        render_ldpr_orders(report.ldpr_orders),
+        render_other_info(report.other_info),
+    ]
+
+
+def _render_options():
+    # Параметры картинок WeasyPrint применяет при вёрстке, а не при записи PDF
+    if len(_image_cache) > IMAGE_CACHE_ENTRIES:
+        _image_cache.clear()
+    return {
+        "optimize_images": PDF_PROFILE["optimize_images"],
+        "dpi": PDF_PROFILE["dpi"],
+        "cache": _image_cache,
+    }
 
-    return html_content, images_paths
 
+def write_options():
+    # Подмножества шрифтов (full_fonts=False) и сжатие потоков; hinting в PDF для печати не нужен
+    return {"full_fonts": PDF_PROFILE["full_fonts"], "hinting": False, "uncompressed_pdf": False}
 
-def generate_pdf_report(json_data, output_filename, debug=False):
-    html_content, images_paths = generate_html_report(json_data)
+
+def layout_document(html_content, stylesheets):
+    from weasyprint import HTML
+    from app.url_fetcher import get_url_fetcher
+
+    return HTML(string=html_content, url_fetcher=get_url_fetcher()).render(
+        stylesheets=stylesheets,
+        font_config=get_font_config(),
+        **_render_options(),
+    )
+
+
+def generate_pdf_report(report, output_filename=None, debug=False):
+    # report — report_ir.ReportIR. Без output_filename PDF возвращается как bytes, на диск ничего не пишется
+    html_content, images_paths = generate_html_report(report)
 
     try:
-        HTML(string=html_content).write_pdf(output_filename)
+        with metrics.stage("layout"):
+            document = layout_document(html_content, get_stylesheets())
+        with metrics.stage("write"):
+            pdf = document.write_pdf(output_filename, **write_options())
+        metrics.count("pages", len(document.pages))
+        metrics.count("pdf_bytes", len(pdf) if pdf is not None else os.path.getsize(output_filename))
         if debug:
             with open("debug.html", "w", encoding="utf-8") as f:
-                f.write(html_content)
+                f.write(html_content.replace("</head>", f"{inline_styles()}</head>", 1))
     finally:
         for image_path in images_paths:
             if os.path.exists(image_path):
                 os.remove(image_path)
+    return pdf
+
+
+
+def render_pdf_chunk(html_content, first):
+    # Часть большого отчёта: без нижних колонтитулов, их номера станут известны только после склейки
+    with metrics.stage("layout"):
+        document = layout_document(html_content, get_stylesheets() + get_chunk_stylesheets(first))
+    with metrics.stage("write"):
+        pdf = document.write_pdf(**write_options())
+    metrics.count("pages", len(document.pages))
+    return pdf, len(document.pages)
+
+
+def merge_pdf_chunks(chunks, output_filename=None):
+    # Склейка частей и сквозные колонтитулы "страница / всего": пустой документ
+    # из одних колонтитулов нужной длины накладывается поверх склеенных страниц
+    from pypdf import PdfReader, PdfWriter
+
+    total = sum(pages for _, pages in chunks)
+    with metrics.stage("layout"):
+        footers = layout_document(render_footer_document(total), get_footer_stylesheets())
+        footers = footers.write_pdf(**write_options())
+
+    with metrics.stage("merge"):
+        footer_pages = PdfReader(io.BytesIO(footers)).pages
+        writer = PdfWriter()
+        for i, (pdf, _) in enumerate(chunks):
+            reader = PdfReader(io.BytesIO(pdf))
+            if i == 0 and reader.metadata:
+                writer.add_metadata(reader.metadata)
+            for page in reader.pages:
+                page.merge_page(footer_pages[len(writer.pages)])
+                # После наложения pypdf оставляет содержимое страницы несжатым
+                writer.add_page(page).compress_content_streams()
+        _dedupe(writer)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+    pdf = buffer.getvalue()
+    metrics.count("pdf_bytes", len(pdf))
+    if output_filename is None:
+        return pdf
+    with open(output_filename, "wb") as f:
+        f.write(pdf)
+
+
+def _dedupe(writer):
+    # Одинаковые объекты из разных документов (шрифты, декор шапки) остаются в одном экземпляре
+    if PDF_PROFILE["dedupe"]:
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+
+
+def merge_pdf_files(items, output_filename):
+    # Сводный PDF пакета: отчёты подряд, у каждого закладка с ФИО депутата
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    with metrics.stage("merge"):
+        for path, title in items:
+            writer.append(path, outline_item=title)
+        _dedupe(writer)
+        with open(output_filename, "wb") as f:
+            writer.write(f)
+    metrics.count("pdf_bytes", os.path.getsize(output_filename))
+
+
+# Минимальный отчёт для прогрева: проходит все стадии, включая диаграмму
+WARMUP_REPORT = {
+    "general_info": {
+        "full_name": "Прогрев", "district": "", "term_start": "", "term_end": "", "links": [],
+        "position": "", "committees": [],
+        "sessions_attended": {
+            "total": "1", "attended": "1", "committee_total": "1",
+            "committee_attended": "1", "ldpr_total": "1", "ldpr_attended": "1",
+        },
+        "region": "", "authority_name": "", "ldpr_position": "",
+    },
+    "legislation": [],
+    "citizen_requests": {
+        "personal_meetings": "1", "responses": "1", "official_queries": "1", "total_requests": "3",
+        "requests": {**{field: "0" for field in Requests.model_fields}, "utilities": "2", "education": "1"},
+        "examples": [{"text": "Прогрев", "links": []}],
+    },
+    "svo_support": {"projects": []},
+    "project_activity": [],
+    "ldpr_orders": [],
+    "other_info": None,
+    "citizen_day_receptions": {},
+}
+
+
+def warm_up():
+    # Импорт тяжёлых библиотек и первый рендер (кэш шрифтов, словари, стили) до первого запроса
+    started = time.perf_counter()
+    import weasyprint  # noqa: F401
+    from app import morphology
+    morphology.get_analyzer()
+    if config.CHART_FORMAT == "png":
+        import matplotlib.pyplot  # noqa: F401
+    imported = time.perf_counter()
+    generate_pdf_report(from_model(LDPRReport(**WARMUP_REPORT)))
+    return {"import_seconds": imported - started, "warmup_seconds": time.perf_counter() - imported}
 
 
 if __name__ == "__main__":
-    input_file = "report_ldpr_Абдель_Щеняй_Ярослав.json"
-    output_file = "report_ldpr_Абдель_Щеняй_Ярослав.pdf"
-
-    json_data = load_json_data(input_file)
-    generate_pdf_report(json_data, output_file, True)
+    # Пакетный рендер из командной строки: python -m app.cli --help
+    import sys
+    from app.cli import main
+    sys.exit(main())
 
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+
+from app import config
+from app.charts import render_svg_chart
+from app.report_template import (
+    render_citizen_requests,
+    render_document,
+    render_general_info,
+    render_ldpr_orders,
+    render_legislation,
+    render_other_info,
+    render_project_activity,
+    render_svo_support,
+)
+from app.styles import preview_styles
+
+
+# Предпросмотр для формы: только HTML, без вёрстки WeasyPrint и без файлов диаграмм.
+# Секция перерисовывается, только если изменились её собственные поля, — при наборе
+# текста в одной секции остальные берутся из кэша.
+
+SECTIONS = (
+    "general_info",
+    "legislation",
+    "citizen_requests",
+    "svo_support",
+    "project_activity",
+    "ldpr_orders",
+    "other_info",
+)
+
+
+def _citizen_requests(requests):
+    # Диаграмма всегда векторная: PNG из matplotlib для предпросмотра слишком дорог
+    return render_citizen_requests(requests, render_svg_chart(requests))
+
+
+# Секция: (входные данные из report_ir.ReportIR, отрисовка)
+_RENDERERS = {
+    "general_info": (lambda report: report.general_info, render_general_info),
+    "legislation": (
+        lambda report: (report.legislation, report.legislation_accepted, report.legislation_rejected),
+        lambda args: render_legislation(*args),
+    ),
+    "citizen_requests": (lambda report: report.citizen_requests, _citizen_requests),
+    "svo_support": (lambda report: report.svo_projects, render_svo_support),
+    "project_activity": (lambda report: report.project_activity, render_project_activity),
+    "ldpr_orders": (lambda report: report.ldpr_orders, render_ldpr_orders),
+    "other_info": (lambda report: report.other_info, render_other_info),
+}
+
+
+class FragmentCache:
+    # LRU готовых HTML-секций. Ключ — (секция, её входные данные): IR состоит из
+    # замороженных dataclass и кортежей, поэтому хэшируется сам, без сериализации.
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        # Предпросмотр рисуется в потоках threadpool, отрисовка секции — вне блокировки
+        self._lock = threading.Lock()
+
+    def get_or_render(self, name, report):
+        select, render = _RENDERERS[name]
+        key = (name, select(report))
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        html = render(key[1])
+        with self._lock:
+            self._items[key] = html
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return html
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._items)}
+
+
+fragment_cache = FragmentCache(config.PREVIEW_CACHE_ENTRIES)
+
+
+def render_section(report, name):
+    return fragment_cache.get_or_render(name, report)
+
+
+def render_preview(report, period=None):
+    # Полный документ со стилями ссылками, чтобы его можно было открыть прямо в браузере
+    sections = [fragment_cache.get_or_render(name, report) for name in SECTIONS]
+    html = render_document(report.general_info.full_name, period or config.REPORT_PERIOD, sections)
+    return html.replace("</head>", f"{preview_styles()}</head>", 1)
@@ -0,0 +1,309 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app import config, memory, metrics
+
+
+# Тот же логгер, что в main: замены процессов видны в общем логе uvicorn
+logger = logging.getLogger("uvicorn.error")
+
+# Приоритеты рендеров: меньше — раньше. Пользователь у формы ждёт ответа,
+# пакет отдаётся по мере готовности, фоновую задачу опрашивают позже.
+INTERACTIVE = 0
+BATCH = 1
+BACKGROUND = 2
+
+
+class QueueFull(Exception):
+    pass
+
+
+class DeadlineExceeded(QueueFull):
+    # Рендер не успел начаться до срока: ответ уже никому не нужен
+    pass
+
+
+# Процессы рендеринга. У каждого свой ProcessPoolExecutor на один процесс: общий пул
+# не умеет завершить конкретный процесс, а раздутый воркер надо заменять по одному,
+# не удваивая число процессов. _idle — номера свободных мест в _workers.
+_workers = []
+_idle = []
+_pending = 0
+# Рендеры, ждущие свободного процесса: куча (приоритет, номер, билет, срок).
+# В сам пул задача уходит только когда есть свободный процесс, поэтому до старта
+# её ещё можно пропустить — клиент ушёл или срок истёк.
+_waiting = []
+_sequence = itertools.count()
+_running = 0
+# Прогрев процессов, пришедших на смену заменённым
+_warm_up_tasks = set()
+# Время импорта и прогрева в этом процессе-воркере
+_boot = None
+
+
+def start():
+    if not _workers:
+        _workers.extend(_new_worker() for _ in range(config.RENDER_WORKERS))
+        _idle[:] = range(len(_workers))
+
+
+def _new_worker():
+    return ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        # Процесс, отработавший столько задач, завершается, а executor запускает вместо него новый
+        max_tasks_per_child=config.RENDER_MAX_TASKS or None,
+    )
+
+
+def _init_worker():
+    global _boot
+    if config.RENDER_WARMUP:
+        # Неудачный прогрев не должен ломать пул: исключение из initializer делает
+        # весь пул BrokenProcessPool, а рендеры без прогрева просто будут холодными
+        try:
+            from app import morphology, pdf_creater, styles
+            _boot = pdf_creater.warm_up()
+            morphology.warm_up()
+            styles.warm_up()
+        except Exception:
+            traceback.print_exc()
+    if config.MEMORY_DEBUG:
+        # После прогрева, чтобы в отчёт не попали импорты и словари
+        memory.start_tracing()
+
+
+def _worker_boot():
+    return os.getpid(), _boot
+
+
+async def _boot_worker(executor):
+    # Запускает процесс и ждёт конца его прогрева: (executor, (pid, замеры)),
+    # вместо замеров None — процесс не поднялся
+    try:
+        return executor, await asyncio.get_running_loop().run_in_executor(executor, _worker_boot)
+    except BrokenProcessPool:
+        traceback.print_exc()
+        return executor, None
+
+
+async def warm_up():
+    # Запускает все воркеры и дожидается их прогрева; возвращает замеры по каждому процессу,
+    # None — если прогрев в процессе не удался. Процесс, который не поднялся, сразу заменяется
+    # новым (его прогрев идёт в фоне, без замеров).
+    start()
+    boots = {}
+    for executor, boot in await asyncio.gather(*(_boot_worker(executor) for executor in _workers)):
+        if boot is not None:
+            pid, timings = boot
+            boots[pid] = timings
+        elif executor in _workers and _workers.index(executor) in _idle:
+            _replace(_workers.index(executor), "worker process failed to start")
+    return boots
+
+
+def _replace(slot, reason):
+    # Вызывается, когда процесс на месте slot свободен: старый завершается сразу,
+    # новый запускается вместо него, так что процессов не становится больше
+    old = _workers[slot]
+    _workers[slot] = _new_worker()
+    old.shutdown(wait=False)
+    metrics.record_recycle()
+    logger.warning("Render worker replaced: %s", reason)
+    if config.RENDER_WARMUP:
+        task = asyncio.create_task(_boot_worker(_workers[slot]))
+        _warm_up_tasks.add(task)
+        task.add_done_callback(_warm_up_tasks.discard)
+
+
+def _replace_reason(future):
+    if future.cancelled():
+        return None
+    error = future.exception()
+    if isinstance(error, BrokenProcessPool):
+        # Воркер убит (например, OOM killer) — такой executor больше не принимает задач
+        return "worker process died"
+    if error is None:
+        _, stats = future.result()
+        if _over_watermark(stats):
+            return f"worker {stats['pid']} RSS {stats['rss'] / 1024 / 1024:.0f} MB"
+    return None
+
+
+def _over_watermark(stats):
+    return bool(config.RENDER_MAX_RSS_MB) and (stats["rss"] or 0) > config.RENDER_MAX_RSS_MB * 1024 * 1024
+
+
+def shutdown():
+    for task in _warm_up_tasks:
+        task.cancel()
+    for executor in _workers:
+        executor.shutdown(wait=True, cancel_futures=True)
+    _workers.clear()
+    _idle.clear()
+
+
+def pending():
+    return _pending
+
+
+def waiting():
+    return sum(1 for _, _, ticket, _ in _waiting if not ticket.done())
+
+
+def _admit(priority):
+    # Очередь полна — место освобождается за счёт самого нового рендера с приоритетом ниже,
+    # а если таких нет, отказывают новому. Вытесненный получает QueueFull, пакеты и задачи его повторят.
+    if _pending < config.RENDER_WORKERS + config.RENDER_QUEUE_LIMIT:
+        return
+    victims = [item for item in _waiting if item[0] > priority and not item[2].done()]
+    metrics.record_admission("shed")
+    if not victims:
+        raise QueueFull()
+    max(victims, key=lambda item: item[:2])[2].set_exception(QueueFull())
+
+
+def _dispatch():
+    global _running
+    while _running < config.RENDER_WORKERS and _waiting:
+        _, _, ticket, _ = heapq.heappop(_waiting)
+        if ticket.done():
+            # Отменён, вытеснен или просрочен, пока ждал
+            continue
+        _running += 1
+        ticket.set_result(None)
+
+
+def _release(slot=None):
+    global _running
+    _running -= 1
+    if slot is not None:
+        _idle.append(slot)
+    _dispatch()
+
+
+def _finish(slot, executor, future):
+    # Рендер на месте slot закончен. Раздутый или упавший процесс заменяется до того,
+    # как место достанется следующему рендеру
+    if slot >= len(_workers) or _workers[slot] is not executor:
+        # Пул остановлен и запущен заново, пока шёл рендер
+        return
+    reason = _replace_reason(future)
+    if reason is not None:
+        _replace(slot, reason)
+    _release(slot)
+
+
+def _submit(slot, func, args):
+    # Процесс мог умереть, пока был свободен (например, OOM killer): тогда executor сразу
+    # отвечает BrokenProcessPool и _finish его не заменит — на этом месте нет рендера.
+    # Место получает новый процесс, и задача уходит в него.
+    executor = _workers[slot]
+    try:
+        return executor, executor.submit(metrics.collect, func, args, time.time())
+    except BrokenProcessPool:
+        _replace(slot, "worker process died")
+    executor = _workers[slot]
+    return executor, executor.submit(metrics.collect, func, args, time.time())
+
+
+def _finish_soon(loop, slot, executor, future):
+    # Вызывается из потока пула
+    try:
+        loop.call_soon_threadsafe(_finish, slot, executor, future)
+    except RuntimeError:
+        # event loop уже закрыт при остановке сервиса
+        pass
+
+
+def _expire(ticket):
+    if not ticket.done():
+        ticket.set_exception(DeadlineExceeded())
+        metrics.record_admission("expired")
+
+
+async def _acquire(priority, deadline):
+    loop = asyncio.get_running_loop()
+    ticket = loop.create_future()
+    heapq.heappush(_waiting, (priority, next(_sequence), ticket, deadline))
+    timer = None
+    if deadline is not None:
+        timer = loop.call_later(max(0.0, deadline - time.monotonic()), _expire, ticket)
+    _dispatch()
+    try:
+        await ticket
+    except asyncio.CancelledError:
+        if ticket.cancelled():
+            metrics.record_admission("cancelled")
+        else:
+            # Процесс уже выделен, но задачу отменили в тот же момент
+            _release()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+
+async def run(func, *args, priority=INTERACTIVE, deadline=None, submitted=None):
+    # Рендер выполняется в отдельном процессе, event loop остаётся свободным.
+    # deadline — время по time.monotonic(), до которого рендер должен начаться,
+    # иначе DeadlineExceeded. Отмена вызывающей корутины до старта снимает рендер
+    # с очереди; начатый рендер доработает, но его результат будет отброшен.
+    # В список submitted попадает future задачи, ушедшей в пул (см. gather).
+    global _pending
+    _admit(priority)
+    start()
+    _pending += 1
+    try:
+        await _acquire(priority, deadline)
+        slot = _idle.pop()
+        loop = asyncio.get_running_loop()
+        try:
+            executor, future = _submit(slot, func, args)
+        except BaseException:
+            _release(slot)
+            raise
+        # Процесс считается занятым до конца рендера, даже если ждать его результат перестали
+        future.add_done_callback(lambda done: _finish_soon(loop, slot, executor, done))
+        if submitted is not None:
+            submitted.append(future)
+        try:
+            result, stats = await asyncio.wrap_future(future)
+        except Exception:
+            metrics.record_failure()
+            raise
+    finally:
+        _pending -= 1
+    metrics.record(stats)
+    return result
+
+
+async def gather(calls, priority=INTERACTIVE, deadline=None):
+    # calls — [(func, args)], выполняются параллельно, результаты в том же порядке.
+    # При первой ошибке остальные вызовы снимаются с очереди, а уже начатые дорабатывают:
+    # исключение пробрасывается, только когда в пуле не осталось ни одного из них,
+    # поэтому общие для вызовов файлы после этого можно удалять.
+    submitted = []
+    tasks = [
+        asyncio.ensure_future(run(func, *args, priority=priority, deadline=deadline, submitted=submitted))
+        for func, args in calls
+    ]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        running = [asyncio.wrap_future(future) for future in submitted if not future.done()]
+        if running:
+            await asyncio.wait(running)
+        raise
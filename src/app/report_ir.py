@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from typing import NamedTuple
+
+from app.charts import CHART_CATEGORIES
+
+
+# Нормализованный отчёт: строится один раз из проверенной модели в процессе API
+# и целиком передаётся в процесс рендера. Числа уже разобраны, категории диаграммы
+# отсортированы, суммы посчитаны — стадии рендера ничего не копируют и не парсят заново.
+
+
+class Count(NamedTuple):
+    # Число из формы: value для логики (0, если не число), text — как ввёл пользователь
+    value: int
+    text: str
+
+
+@dataclass(slots=True, frozen=True)
+class Sessions:
+    total: Count
+    attended: Count
+    committee_total: Count
+    committee_attended: Count
+    ldpr_total: Count
+    ldpr_attended: Count
+
+
+@dataclass(slots=True, frozen=True)
+class GeneralInfo:
+    full_name: str
+    district: str
+    region: str
+    authority_name: str
+    term_start: str
+    term_end: str
+    position: str
+    ldpr_position: str | None
+    committees: tuple[str, ...]
+    links: tuple[str, ...]
+    sessions: Sessions
+
+
+@dataclass(slots=True, frozen=True)
+class Bill:
+    title: str
+    summary: str
+    status: str
+    rejection_reason: str | None
+
+
+@dataclass(slots=True, frozen=True)
+class CitizenRequests:
+    personal_meetings: Count
+    responses: Count
+    official_queries: Count
+    appeals: Count
+    receptions: int
+    examples: tuple[str, ...]
+    # (подпись, число) в порядке CHART_CATEGORIES и без нулей по убыванию
+    categories: tuple[tuple[str, int], ...]
+    chart_rows: tuple[tuple[str, int], ...]
+    chart_total: int
+    chart_max: int
+
+
+@dataclass(slots=True, frozen=True)
+class ReportIR:
+    general_info: GeneralInfo
+    legislation: tuple[Bill, ...]
+    legislation_accepted: int
+    legislation_rejected: int
+    citizen_requests: CitizenRequests
+    svo_projects: tuple[str, ...]
+    project_activity: tuple[tuple[str, str], ...]
+    ldpr_orders: tuple[tuple[str, str], ...]
+    other_info: str | None
+    # Всего пунктов во всех списках — по нему отчёт считается большим
+    item_count: int
+
+
+def count(text):
+    try:
+        return Count(int(text), text)
+    except (TypeError, ValueError):
+        return Count(0, text)
+
+
+def from_model(report):
+    info = report.general_info
+    sessions = info.sessions_attended
+    requests = report.citizen_requests
+
+    # Отрицательное число в форме — опечатка, на диаграмме это ноль
+    categories = tuple(
+        (label, max(count(getattr(requests.requests, field)).value, 0))
+        for label, field in CHART_CATEGORIES
+    )
+    legislation = tuple(
+        Bill(item.title, item.summary, item.status, item.rejection_reason)
+        for item in report.legislation
+    )
+    svo_projects = tuple(project.text or "" for project in report.svo_support.projects)
+
+    return ReportIR(
+        general_info=GeneralInfo(
+            full_name=info.full_name,
+            district=info.district,
+            region=info.region,
+            authority_name=info.authority_name,
+            term_start=info.term_start,
+            term_end=info.term_end,
+            position=info.position,
+            ldpr_position=info.ldpr_position,
+            committees=tuple(info.committees),
+            links=tuple(info.links),
+            sessions=Sessions(
+                total=count(sessions.total),
+                attended=count(sessions.attended),
+                committee_total=count(sessions.committee_total),
+                committee_attended=count(sessions.committee_attended),
+                ldpr_total=count(sessions.ldpr_total),
+                ldpr_attended=count(sessions.ldpr_attended),
+            ),
+        ),
+        legislation=legislation,
+        legislation_accepted=sum(1 for bill in legislation if bill.status.startswith('Принято')),
+        legislation_rejected=sum(1 for bill in legislation if bill.status == 'Отклонено'),
+        citizen_requests=CitizenRequests(
+            personal_meetings=count(requests.personal_meetings),
+            responses=count(requests.responses),
+            official_queries=count(requests.official_queries),
+            appeals=count(requests.requests.appeals_to_ldpr_chairman),
+            receptions=sum(report.citizen_day_receptions.values()),
+            examples=tuple(example.text for example in requests.examples),
+            categories=categories,
+            chart_rows=tuple(sorted((row for row in categories if row[1]), key=lambda row: row[1], reverse=True)),
+            chart_total=sum(value for _, value in categories),
+            chart_max=max(value for _, value in categories),
+        ),
+        svo_projects=svo_projects,
+        project_activity=tuple((item.name, item.result) for item in report.project_activity),
+        ldpr_orders=tuple((item.instruction, item.action) for item in report.ldpr_orders),
+        other_info=report.other_info,
+        item_count=(
+            len(legislation) + len(report.project_activity) + len(report.ldpr_orders)
+            + len(svo_projects) + len(requests.examples)
+        ),
+    )
@@ -0,0 +1,44 @@
+import os
+
+from app import config, render_pool
+from app.media_store import media_store
+from app.pdf_creater import (
+    generate_html_chunks,
+    generate_pdf_report,
+    is_large_report,
+    merge_pdf_chunks,
+    render_pdf_chunk,
+)
+
+
+async def render_report(report, output_filename=None, priority=render_pool.INTERACTIVE, deadline=None):
+    # Обычный отчёт верстается целиком в одном процессе пула. Большой — частями
+    # по секциям в нескольких процессах, затем части склеиваются со сквозной нумерацией страниц.
+    # deadline касается только первого шага: начатый большой отчёт доводится до конца.
+    if config.LARGE_REPORT_CHUNKS < 2 or not is_large_report(report):
+        return await render_pool.run(
+            generate_pdf_report, report, output_filename, priority=priority, deadline=deadline
+        )
+
+    documents, images_paths = await render_pool.run(
+        generate_html_chunks, report, config.LARGE_REPORT_CHUNKS, priority=priority, deadline=deadline
+    )
+    # PNG диаграмм удаляются, только когда ни одна часть их больше не верстает
+    try:
+        chunks = await render_pool.gather(
+            [(render_pdf_chunk, (html_content, i == 0)) for i, html_content in enumerate(documents)],
+            priority,
+        )
+    finally:
+        for image_path in images_paths:
+            if os.path.exists(image_path):
+                os.remove(image_path)
+    return await render_pool.run(merge_pdf_chunks, chunks, output_filename, priority=priority)
+
+
+async def render_to_media(report, priority=render_pool.INTERACTIVE, deadline=None):
+    # Рендер в новый файл media/, возвращает имя файла
+    report_filename = media_store.new_name()
+    await render_report(report, media_store.path(report_filename), priority, deadline)
+    media_store.add(report_filename)
+    return report_filename
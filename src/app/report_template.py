@@ -0,0 +1,406 @@
+import re
+from html import escape
+from string import Formatter
+from textwrap import dedent
+
+from app.morphology import declense_noun, inflect
+
+
+class Template:
+    # Шаблон с полями {name}: разбирается один раз при импорте модуля,
+    # при отрисовке остаётся только склеить готовые куски со значениями.
+    # Значения подставляются как есть, экранирование — забота вызывающего.
+
+    def __init__(self, source):
+        # Чётные элементы — статический текст, нечётные — имена полей.
+        # Formatter отдаёт текст вокруг {{ и }} отдельными кусками без поля — они дописываются
+        # к предыдущему тексту
+        self._parts = []
+        for literal, field, _, _ in Formatter().parse(dedent(source).strip()):
+            if len(self._parts) % 2:
+                self._parts[-1] += literal
+            else:
+                self._parts.append(literal)
+            if field is not None:
+                self._parts.append(field)
+        self._fields = self._parts[1::2]
+
+    def render(self, **values):
+        parts = self._parts[:]
+        parts[1::2] = [values[field] for field in self._fields]
+        return "".join(parts)
+
+
+_SPECIAL_CHARS = re.compile(r"[&<>\"']")
+
+
+def esc(value):
+    if value is None:
+        return ""
+    value = str(value)
+    # Большинство полей не содержит спецсимволов — не копируем строку лишний раз
+    if _SPECIAL_CHARS.search(value) is None:
+        return value
+    return escape(value)
+
+
+def delete_dot(string):
+    if not string or string[-1] != ".":
+        return string
+    return string[:-1]
+
+
+HEADER_DECORATION = "data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNTQwIiBoZWlnaHQ9IjU0MCIgdmlld0JveD0iMCAwIDU0MCA1NDAiIGZpbGw9Im5vbmUiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyI+PGcgY2xpcC1wYXRoPSJ1cmwoI2NsaXAwXzIwNjZfMzY2KSI+PHBhdGggZD0iTTAgMzkwQzAgMzIzLjcyNiA1My43MjU4IDI3MCAxMjAgMjcwSDI3MFY1NDBIMFYzOTBaIiBmaWxsPSIjQ0NEOEU4Ii8+PHBhdGggZD0iTTI3MCAxMjBDMjcwIDIwMi84NDMgMzM3LjE1NyAyNzAgNDIwIDI3MEg1NDBWMEgyNzBWMTIwWiIgZmlsbD0iIzM5NEI4QyIvPjxwYXRoIGQ9Ik01NDAgNTQwVjI3MEgyNzBWNTQwSDU0MFoiIGZpbGw9IiNGRkM1MzEiLz48cGF0aCBmaWxsLXJ1bGU9ImV2ZW5vZGQiIGNsaXAtcnVsZT0iZXZlbm9kZCIgZD0iTTI3MCA0NDlDMjcwIDM1MC4xNDEgMTg5Ljg1OSAyNzAgOTEgMjcwQzE4OS44NTkgMjcwIDI3NCAxODkuODU5IDI3MCA5MUMyNzAgMTg5Ljg1OSAzNTAuMTQxIDI3NCA0NDkgMjcwQzM1MC4xNDEgMjcwIDI3NCAzNTAuMTQxIDI3MCA0NDlaIiBmaWxsPSJ3aGl0ZSIvPjwvZz48ZGVmcz48Y2xpcFBhdGggaWQ9ImNsaXAwXzIwNjZfMzY2Ij48cmVjdCB3aWR0aD0iNTQwIiBoZWlnaHQ9IjU0MCIgZmlsbD0id2hpdGUiLz48L2NsaXBQYXRoPjwvZGVmcz48L3N2Zz4="
+
+DOCUMENT = Template("""
+    <!DOCTYPE html>
+    <html lang="ru">
+    <head>
+        <meta charset="UTF-8">
+        <title>ОТЧЕТ ДЕЯТЕЛЬНОСТИ ДЕПУТАТА ЛДПР</title>
+    </head>
+    <body>
+    <div class="header">
+        <div class="header-decoration left"></div>
+        <div class="header-decoration right">
+            <img src="{decoration}" alt="Right decoration">
+        </div>
+        <div class="header-content">
+            <h1 class="first">{title_first}</h1>
+            <h1 class="second">{title_second}</h1>
+            <h2>{full_name}</h2>
+            <p>по итогам {period}</p>
+        </div>
+    </div>
+    <div class="container">
+    {sections}
+    </div>
+    </body>
+    </html>
+""")
+
+# Продолжение большого отчёта, свёрстанное отдельно: те же секции без шапки
+CHUNK_DOCUMENT = Template("""
+    <!DOCTYPE html>
+    <html lang="ru">
+    <head>
+        <meta charset="UTF-8">
+    </head>
+    <body>
+    <div class="container">
+    {sections}
+    </div>
+    </body>
+    </html>
+""")
+
+# Пустые страницы с одними колонтитулами, накладываются на склеенный отчёт
+FOOTER_DOCUMENT = Template("""
+    <!DOCTYPE html>
+    <html lang="ru">
+    <body>{pages}</body>
+    </html>
+""")
+FOOTER_PAGE_BREAK = '<div style="break-after: page"></div>'
+
+SECTION = Template("""
+    <div class="section-container{css_class}">
+        <h3>{title}</h3>
+        <div>
+            {body}
+        </div>
+    </div>
+""")
+
+GENERAL_INFO = Template("""
+    <p>ФИО: <strong>{full_name}</strong></p>
+    <p>Избирательный округ: {district}</p>
+    <p>Субъект Российской Федерации: {region}</p>
+    <p>Представительный орган власти: {authority_name}</p>
+    <p>Срок полномочий: {term_start} - {term_end}</p>
+    <p>Должность: {position}</p>
+    <p>Должность во фракции ЛДПР: {ldpr_position}</p>
+    {committees}
+    <p class="mb-4">Участие в заседаниях:</p>
+    <ul class="list-disc">
+        <li class="small">Заседания органа власти: присутствовал на {attended} из {total} {total_noun}.</li>
+        <li class="small">Заседания комитетов: присутствовал на {committee_attended} из {committee_total} {committee_noun}.</li>
+        <li class="small">Заседания фракции ЛДПР: присутствовал на {ldpr_attended} из {ldpr_total} {ldpr_noun}.</li>
+    </ul>
+    {links}
+""")
+
+CITIZEN_REQUESTS = Template("""
+    <p class="mb-4">Депутат провел <strong>{personal_meetings}</strong> личных {personal_meetings_noun} граждан в том числе {receptions} {receptions_noun} в рамках Всероссийского дня приема граждан. За отчетный период поступило множество письменных обращений, охватывающих различные темы:</p>
+    <div class="table-container">
+        {chart}
+    </div>
+    {ldpr_requests}
+    <p class="mt-4">На обращения граждан было дано <strong>{responses}</strong> {responses_noun}, а также направлено <strong>{official_queries}</strong> депутатских {official_queries_noun} в органы власти и иные организации. Среди примеров успешной работы можно отметить {examples}</p>
+""")
+
+LDPR_REQUESTS = Template("""
+    <p class="mt-4 big"><strong>Получено обращений на имя Председателя ЛДПР: <b>{appeals}</b></strong></p>
+""")
+
+# Сводный отчёт по регионам (app/rollup.py): числа приходят уже посчитанными
+ROLLUP_TITLE = ("СВОДНЫЙ ОТЧЕТ О РАБОТЕ", "ДЕПУТАТОВ ЛДПР")
+
+ROLLUP_TABLE = Template("""
+    <table class="rollup-table">
+        <thead>
+            <tr><th class="region">Регион</th><th>Депутатов</th><th>Внесено законопроектов</th><th>Принято</th><th>Отклонено</th><th>Посещаемость заседаний</th><th>Обращений</th></tr>
+        </thead>
+        <tbody>{rows}</tbody>
+        <tfoot>{total}</tfoot>
+    </table>
+""")
+
+ROLLUP_ROW = Template("""
+    <tr><td class="region">{region}</td><td>{deputies}</td><td>{bills}</td><td>{accepted}</td><td>{rejected}</td><td>{attendance}</td><td>{requests}</td></tr>
+""")
+
+ROLLUP_REQUESTS = Template("""
+    <p class="mb-4">Депутаты провели <strong>{personal_meetings}</strong> личных {personal_meetings_noun} граждан, в том числе {receptions} {receptions_noun} в рамках Всероссийского дня приема граждан. Письменные обращения по темам:</p>
+    <div class="table-container">
+        {chart}
+    </div>
+    <p class="mt-4">На обращения граждан дано <strong>{responses}</strong> {responses_noun}, направлено <strong>{official_queries}</strong> депутатских {official_queries_noun}. Обращений на имя Председателя ЛДПР: <strong>{appeals}</strong>.</p>
+""")
+
+ROLLUP_REGION = Template("""
+    <div class="rollup-region">
+        <h4>{region}</h4>
+        <p>{deputies} {deputies_noun}, внесено {bills} {bills_noun}: принято — {accepted}, отклонено — {rejected}. Посещаемость заседаний: органа власти — {attendance}, комитетов — {committee_attendance}, фракции ЛДПР — {ldpr_attendance}.</p>
+        {requests}
+    </div>
+""")
+
+SECTION_TITLES = {
+    "general_info": "1. ОБЩАЯ ИНФОРМАЦИЯ",
+    "legislation": "2. ЗАКОНОТВОРЧЕСКАЯ ДЕЯТЕЛЬНОСТЬ",
+    "citizen_requests": "3. РАБОТА С ОБРАЩЕНИЯМИ ГРАЖДАН",
+    "svo_support": "4. ПОДДЕРЖКА УЧАСТНИКОВ СВО И ИХ СЕМЕЙ",
+    "project_activity": "5. ПРЕДСТАВИТЕЛЬСКАЯ И ПРОЕКТНАЯ ДЕЯТЕЛЬНОСТЬ",
+    "ldpr_orders": "6. РАБОТА ПО ПОРУЧЕНИЯМ ПРЕДСЕДАТЕЛЯ ЛДПР",
+    "other_info": "7. ИНАЯ ЗНАЧИМАЯ ИНФОРМАЦИЯ",
+}
+
+
+def _items(items, css_class="mb-2"):
+    return "".join(f'<li class="{css_class}">{item}</li>' for item in items)
+
+
+def _list(items, css_class="mb-2"):
+    return f"<ul class='list-disc pl-6'>{_items(items, css_class)}</ul>"
+
+
+def _shown(items):
+    # Список из одного элемента (обычно пустая строка из формы) не выводится
+    return bool(items) and len(items) != 1 and bool(items[0])
+
+
+def _format_list(items, singular, plural, case='nomn', item_format=esc):
+    if not items:
+        return f"не {plural}."
+    if len(items) == 1:
+        noun = inflect(singular, frozenset({case, 'sing'}))
+        return f"{noun}: <ul class='list-disc pl-6'><li>{item_format(items[0])}</li></ul>"
+    noun = inflect(plural, frozenset({case, 'plur'}))
+    return f"{noun}: {_list(item_format(item) for item in items)}"
+
+
+def section(name, body, css_class=""):
+    return SECTION.render(css_class=css_class, title=SECTION_TITLES[name], body=body)
+
+
+def render_general_info(info):
+    sessions = info.sessions
+    committees = ""
+    if _shown(info.committees):
+        committees = f"<p>Комитеты и комиссии, в которых состоит:</p> {_list(map(esc, info.committees), 'mb-2 small')}"
+    links = ""
+    if _shown(info.links):
+        links_html = _list(
+            (f'<a href="{esc(link)}" class="text-ldpr-blue">{esc(link)}</a>' for link in info.links),
+            "mb-2 small",
+        )
+        links = f"Ссылки на ресурсы: {links_html}"
+    body = GENERAL_INFO.render(
+        full_name=esc(info.full_name),
+        district=esc(info.district.strip()),
+        region=esc(info.region.strip()),
+        authority_name=esc(info.authority_name.strip()),
+        term_start=esc(info.term_start),
+        term_end=esc(info.term_end),
+        position=esc(info.position),
+        ldpr_position=esc(info.ldpr_position),
+        committees=committees,
+        attended=esc(sessions.attended.text),
+        total=esc(sessions.total.text),
+        total_noun=declense_noun("заседание", sessions.total.value),
+        committee_attended=esc(sessions.committee_attended.text),
+        committee_total=esc(sessions.committee_total.text),
+        committee_noun=declense_noun("заседание", sessions.committee_total.value),
+        ldpr_attended=esc(sessions.ldpr_attended.text),
+        ldpr_total=esc(sessions.ldpr_total.text),
+        ldpr_noun=declense_noun("заседание", sessions.ldpr_total.value),
+        links=links,
+    )
+    return section("general_info", body)
+
+
+def render_legislation(legislation, accepted, rejected):
+    count = len(legislation)
+    if count == 0:
+        text = "законопроекты за отчетный период не вносились."
+    else:
+        items = []
+        for bill in legislation:
+            reason = ""
+            if bill.rejection_reason:
+                reason = f" Причина отклонения: {esc(delete_dot(bill.rejection_reason))}."
+            items.append(
+                f'<strong>«{esc(bill.title.strip())}»</strong>: {esc(delete_dot(bill.summary.strip()))}. '
+                f'<span>Статус: {esc(bill.status)}.</span>{reason}'
+            )
+        text = (
+            f"Внёс {count} {declense_noun('законопроект', count)} из которых принято — {accepted}, "
+            f"отклонено — {rejected}.{_list(items)}"
+        )
+    return section("legislation", f"<p>{text}</p>")
+
+
+def render_citizen_requests(requests, chart):
+    appeals = requests.appeals
+    ldpr_requests = LDPR_REQUESTS.render(appeals=esc(appeals.text)) if appeals.value > 0 else ""
+    examples = _format_list(
+        requests.examples,
+        "достижение",
+        "достижения",
+        'nomn',
+        lambda text: f'<span>{esc(delete_dot(text))}.</span>',
+    )
+    body = CITIZEN_REQUESTS.render(
+        personal_meetings=esc(requests.personal_meetings.text),
+        personal_meetings_noun=declense_noun("прием", requests.personal_meetings.value),
+        receptions=str(requests.receptions),
+        receptions_noun=declense_noun("встреча", requests.receptions),
+        chart=chart,
+        ldpr_requests=ldpr_requests,
+        responses=esc(requests.responses.text),
+        responses_noun=declense_noun("ответ", requests.responses.value),
+        official_queries=esc(requests.official_queries.text),
+        official_queries_noun=declense_noun("запрос", requests.official_queries.value),
+        examples=examples,
+    )
+    return section("citizen_requests", body)
+
+
+def render_svo_support(projects):
+    if not projects:
+        text = "проекты по поддержке СВО за отчетный период не проводились."
+    else:
+        text = _list(f"{esc(delete_dot(project.strip()))}." for project in projects if project)
+    return section("svo_support", f"<p>{text}</p>")
+
+
+def render_project_activity(project_activity):
+    if not project_activity:
+        text = "проекты и мероприятия за отчетный период не проводились."
+    else:
+        text = _list(
+            f'<strong>«{esc(name.strip())}»</strong>: {esc(delete_dot(result.strip()))}.'
+            for name, result in project_activity
+        )
+    return section("project_activity", f"<p>{text}</p>")
+
+
+def render_ldpr_orders(ldpr_orders):
+    if not ldpr_orders:
+        text = "поручения Председателя ЛДПР за отчетный период отсутствуют."
+    else:
+        text = _list(
+            f'<strong>«{esc(instruction.strip())}»</strong>: {esc(delete_dot(action.strip()))}.'
+            for instruction, action in ldpr_orders
+        )
+    return section("ldpr_orders", f"<p>{text}</p>")
+
+
+def render_other_info(other_info):
+    other_info = (other_info or "").strip()
+    if not other_info:
+        return ""
+    text = esc(delete_dot(other_info)).replace("\\n", "<br>").replace("\n", "<br>")
+    return section("other_info", f"<p>{text}.</p>", " other_info")
+
+
+REPORT_TITLE = ("ОТЧЕТ О ПРОДЕЛАННОЙ", "РАБОТЕ ДЕПУТАТА ЛДПР")
+
+
+def render_rollup_table(rows, total):
+    # rows и total — кортежи (регион, депутатов, внесено, принято, отклонено, посещаемость, обращений)
+    def row(values):
+        region, *numbers = values
+        names = ("deputies", "bills", "accepted", "rejected", "attendance", "requests")
+        return ROLLUP_ROW.render(region=esc(region), **{name: esc(value) for name, value in zip(names, numbers)})
+
+    return ROLLUP_TABLE.render(rows="".join(map(row, rows)), total=row(total))
+
+
+def render_rollup_requests(activity, chart):
+    # activity — (личных приемов, ответов, депутатских запросов, обращений к Председателю, встреч в день приема)
+    personal_meetings, responses, official_queries, appeals, receptions = activity
+    return ROLLUP_REQUESTS.render(
+        personal_meetings=str(personal_meetings),
+        personal_meetings_noun=declense_noun("прием", personal_meetings),
+        receptions=str(receptions),
+        receptions_noun=declense_noun("встреча", receptions),
+        chart=chart,
+        responses=str(responses),
+        responses_noun=declense_noun("ответ", responses),
+        official_queries=str(official_queries),
+        official_queries_noun=declense_noun("запрос", official_queries),
+        appeals=str(appeals),
+    )
+
+
+def render_rollup_region(region, deputies, legislation, attendance, requests):
+    # legislation — (внесено, принято, отклонено), attendance — три строки с процентами
+    bills, accepted, rejected = legislation
+    return ROLLUP_REGION.render(
+        region=esc(region),
+        deputies=str(deputies),
+        deputies_noun=declense_noun("депутат", deputies),
+        bills=str(bills),
+        bills_noun=declense_noun("законопроект", bills),
+        accepted=str(accepted),
+        rejected=str(rejected),
+        attendance=attendance[0],
+        committee_attendance=attendance[1],
+        ldpr_attendance=attendance[2],
+        requests=requests,
+    )
+
+
+def rollup_section(title, body):
+    return SECTION.render(css_class="", title=title, body=body)
+
+
+def render_document(full_name, period, sections, title=REPORT_TITLE):
+    return DOCUMENT.render(
+        decoration=HEADER_DECORATION,
+        title_first=title[0],
+        title_second=title[1],
+        full_name=esc(full_name),
+        period=esc(period),
+        sections="".join(sections),
+    )
+
+
+def render_chunk_document(sections):
+    return CHUNK_DOCUMENT.render(sections="".join(sections))
+
+
+def render_footer_document(pages):
+    return FOOTER_DOCUMENT.render(pages=FOOTER_PAGE_BREAK * (pages - 1))
@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+from app import backends, config
+from app.pdf_creater import TEMPLATE_VERSION
+
+
+class ResultCache:
+    # Готовые PDF по хэшу содержимого отчёта. Одинаковые запросы, пришедшие
+    # одновременно, ждут один и тот же рендер. С общим индексом (QUEUE_BACKEND=sqlite)
+    # попаданием считается и файл, отрендеренный другим экземпляром.
+
+    def __init__(self, directory, max_bytes, max_memory_bytes, ttl, index=None):
+        self.directory = directory
+        self.index = index
+        self.max_bytes = max_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._data = OrderedDict()
+        self._data_bytes = 0
+        self._inflight = {}
+
+    @staticmethod
+    def key(report):
+        payload = json.dumps(report.model_dump(mode="json"), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        version = (
+            f"{TEMPLATE_VERSION}:{config.CHART_FORMAT}:{config.REPORT_PERIOD}:"
+            f"{config.PDF_PROFILE}:{config.PDF_DPI}:{config.CHART_DPI}"
+        )
+        return hashlib.sha256(f"{version}\0{payload}".encode("utf-8")).hexdigest()
+
+    async def get_or_render(self, key, render):
+        # render — корутина-фабрика, возвращающая имя файла в directory
+        filename = self._lookup(key) or await self._lookup_shared(key)
+        if filename is not None:
+            self.hits += 1
+            return filename
+        return await self._coalesce(("file", key), lambda: self._render(key, render))
+
+    async def get_or_render_bytes(self, key, render):
+        # То же для отдачи PDF в ответе: render возвращает bytes, результат
+        # хранится в памяти, а готовый файл из directory тоже считается попаданием
+        data = self._lookup_data(key)
+        if data is None:
+            filename = self._lookup(key) or await self._lookup_shared(key)
+            if filename is not None:
+                try:
+                    with open(os.path.join(self.directory, filename), "rb") as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    # media_store успел удалить файл
+                    data = None
+        if data is not None:
+            self.hits += 1
+            return data
+        return await self._coalesce(("data", key), lambda: self._render_data(key, render))
+
+    async def _coalesce(self, inflight_key, factory):
+        # _inflight: ключ -> [задача рендера, сколько запросов её ждут]
+        entry = self._inflight.get(inflight_key)
+        if entry is None:
+            self.misses += 1
+            entry = self._inflight[inflight_key] = [asyncio.ensure_future(factory()), 0]
+            entry[0].add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+        else:
+            self.coalesced += 1
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # Отмена одного из ожидающих запросов не должна прерывать общий рендер
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            # ...а когда ушли все, рендер никому не нужен и снимается с очереди
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "memory_entries": len(self._data),
+            "memory_bytes": self._data_bytes,
+        }
+
+    async def _render(self, key, render):
+        filename = await render()
+        size = os.path.getsize(os.path.join(self.directory, filename))
+        created_at = time.time()
+        self._entries[key] = (filename, size, created_at)
+        self._bytes += size
+        self._evict()
+        if self.index is not None:
+            await asyncio.to_thread(self.index.put, key, filename, size, created_at)
+        return filename
+
+    async def _lookup_shared(self, key):
+        if self.index is None:
+            return None
+        entry = await asyncio.to_thread(self.index.get, key)
+        if entry is None or not os.path.exists(os.path.join(self.directory, entry[0])):
+            return None
+        # Файл соседа учитывается и в местном индексе, под его исходным временем создания
+        if key not in self._entries:
+            self._entries[key] = entry
+            self._bytes += entry[1]
+            self._evict()
+        return entry[0]
+
+    async def _render_data(self, key, render):
+        data = await render()
+        if len(data) <= self.max_memory_bytes:
+            self._data[key] = (data, time.time())
+            self._data_bytes += len(data)
+            while self._data_bytes > self.max_memory_bytes:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self._data_bytes -= len(evicted)
+        return data
+
+    def _lookup_data(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        data, created_at = entry
+        if time.time() - created_at > self.ttl:
+            del self._data[key]
+            self._data_bytes -= len(data)
+            return None
+        self._data.move_to_end(key)
+        return data
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        filename, _, created_at = entry
+        if time.time() - created_at > self.ttl or not os.path.exists(os.path.join(self.directory, filename)):
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return filename
+
+    def _evict(self):
+        now = time.time()
+        for key in [key for key, (_, _, created_at) in self._entries.items() if now - created_at > self.ttl]:
+            self._remove(key)
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        # Забывается только запись кэша: файл остаётся в media/, пока по ссылке его могут
+        # скачать, а удаляет его media_store по MEDIA_TTL и MEDIA_MAX_BYTES
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+result_cache = ResultCache(
+    config.MEDIA_DIR,
+    config.RESULT_CACHE_BYTES,
+    config.RESULT_CACHE_MEMORY_BYTES,
+    config.RESULT_CACHE_TTL,
+    backends.result_index(),
+)
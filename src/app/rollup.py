@@ -0,0 +1,398 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from app import config, metrics
+from app.charts import CHART_CATEGORIES
+from app.model import LDPRReport
+from app.pdf_creater import layout_document, load_json_data, render_chart, write_options
+from app.report_ir import from_model
+from app.report_template import (
+    ROLLUP_TITLE,
+    render_document,
+    render_rollup_region,
+    render_rollup_requests,
+    render_rollup_table,
+    rollup_section,
+)
+from app.styles import get_stylesheets
+
+
+# Сводки по регионам и по стране из тысяч отчётов депутатов. Каждый отчёт превращается
+# в одну строку чисел, строки складываются в столбцы NumPy, а суммы по регионам
+# считаются одним проходом по отсортированным столбцам, без циклов по депутатам.
+# Запуск из src: python -m app.rollup reports/ -o rollup.pdf --json rollup.json
+
+NO_REGION = "Регион не указан"
+FEDERAL = "Российская Федерация"
+
+CATEGORY_LABELS = tuple(label for label, _ in CHART_CATEGORIES)
+SESSION_FIELDS = ("total", "attended", "committee_total", "committee_attended", "ldpr_total", "ldpr_attended")
+LEGISLATION_FIELDS = ("bills", "accepted", "rejected")
+ACTIVITY_FIELDS = ("personal_meetings", "responses", "official_queries", "appeals", "receptions")
+
+
+class Row(NamedTuple):
+    # Один отчёт в виде чисел; порядок полей — как в *_FIELDS и CHART_CATEGORIES
+    region: str
+    categories: tuple[int, ...]
+    sessions: tuple[int, ...]
+    legislation: tuple[int, int, int]
+    activity: tuple[int, ...]
+
+
+@dataclass(slots=True, frozen=True)
+class Columns:
+    # По строке на отчёт; region — номер в regions (отсортированы по алфавиту)
+    regions: tuple[str, ...]
+    region: np.ndarray
+    categories: np.ndarray
+    sessions: np.ndarray
+    legislation: np.ndarray
+    activity: np.ndarray
+
+
+@dataclass(slots=True, frozen=True)
+class Rollup:
+    # По строке на регион, в том же порядке, что regions
+    regions: tuple[str, ...]
+    deputies: np.ndarray
+    categories: np.ndarray
+    sessions: np.ndarray
+    legislation: np.ndarray
+    activity: np.ndarray
+
+
+class ChartData(NamedTuple):
+    # То немногое из report_ir.CitizenRequests, что нужно диаграмме
+    chart_rows: tuple[tuple[str, int], ...]
+    chart_max: int
+
+
+def to_row(report):
+    # report — report_ir.ReportIR
+    sessions = report.general_info.sessions
+    requests = report.citizen_requests
+    return Row(
+        region=report.general_info.region.strip() or NO_REGION,
+        categories=tuple(value for _, value in requests.categories),
+        sessions=tuple(getattr(sessions, field).value for field in SESSION_FIELDS),
+        legislation=(len(report.legislation), report.legislation_accepted, report.legislation_rejected),
+        activity=(
+            requests.personal_meetings.value,
+            requests.responses.value,
+            requests.official_queries.value,
+            requests.appeals.value,
+            requests.receptions,
+        ),
+    )
+
+
+def load_row(source):
+    # Для пула процессов: (строка, None) или (None, ошибка)
+    try:
+        item = load_json_data(source)
+    except (OSError, ValueError) as e:
+        return None, str(e)
+    return _item_row(item)
+
+
+class RollupTooLarge(ValueError):
+    pass
+
+
+async def read_body(request, ndjson, max_items, max_bytes):
+    # Тело /rollup читается с ограничениями ещё до разбора: не больше max_bytes,
+    # а в NDJSON — не больше max_items непустых строк. Лишнее не дочитывается (код 413).
+    body = bytearray()
+    lines = 0
+    in_line = False
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise RollupTooLarge(f"Rollup body is limited to {max_bytes} bytes")
+        if ndjson:
+            *ended, last = chunk.split(b"\n")
+            for part in ended:
+                lines += in_line or bool(part.strip())
+                in_line = False
+            in_line = in_line or bool(last.strip())
+            if lines + in_line > max_items:
+                raise RollupTooLarge(f"Rollup is limited to {max_items} reports")
+    return bytes(body)
+
+
+def load_rows(body):
+    # Для пула процессов: часть NDJSON из /rollup -> [(строка, None) или (None, ошибка)]
+    return [_item_row(line) for line in body.split(b"\n") if line.strip()]
+
+
+def _item_row(item):
+    try:
+        if isinstance(item, bytes):
+            item = json.loads(item)
+        report = LDPRReport.model_validate(item)
+    except (ValueError, ValidationError) as e:
+        return None, str(e)
+    return to_row(from_model(report)), None
+
+
+def to_ndjson(body, max_items):
+    # Для пула процессов: JSON-массив отчётов -> NDJSON, который дальше делится на части
+    # по строкам. Процесс API тело не разбирает: json.loads десятков мегабайт держит GIL.
+    try:
+        items = json.loads(body)
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        raise ValueError("Body must be a JSON array of reports or NDJSON")
+    if len(items) > max_items:
+        raise RollupTooLarge(f"Rollup is limited to {max_items} reports")
+    return b"\n".join(json.dumps(item, ensure_ascii=False).encode("utf-8") for item in items)
+
+
+def split_ndjson(body, parts):
+    # Примерно равные части по границам строк, без разбора JSON
+    step = max(1, -(-len(body) // parts))
+    chunks = []
+    start = 0
+    while start < len(body):
+        end = body.find(b"\n", start + step)
+        end = len(body) if end < 0 else end + 1
+        chunks.append(body[start:end])
+        start = end
+    return chunks
+
+
+def summarize(results):
+    # (сводка или None, номера неверных отчётов); results — из load_rows в исходном порядке
+    rows = [row for row, _ in results if row is not None]
+    skipped = [index for index, (row, _) in enumerate(results) if row is None]
+    return (aggregate(to_columns(rows)) if rows else None), skipped
+
+
+def _matrix(values, width):
+    # Отрицательные числа в форме — опечатки, в суммах они считаются нулями
+    matrix = np.array(values, dtype=np.int64).reshape(-1, width)
+    return np.maximum(matrix, 0, out=matrix)
+
+
+def to_columns(rows):
+    regions, region = np.unique(np.array([row.region for row in rows], dtype=str), return_inverse=True)
+    return Columns(
+        regions=tuple(regions.tolist()),
+        region=region.astype(np.int32),
+        categories=_matrix([row.categories for row in rows], len(CATEGORY_LABELS)),
+        sessions=_matrix([row.sessions for row in rows], len(SESSION_FIELDS)),
+        legislation=_matrix([row.legislation for row in rows], len(LEGISLATION_FIELDS)),
+        activity=_matrix([row.activity for row in rows], len(ACTIVITY_FIELDS)),
+    )
+
+
+def aggregate(columns):
+    # Строки сортируются по региону, и каждый столбец суммируется по участкам одним reduceat
+    order = np.argsort(columns.region, kind="stable")
+    region = columns.region[order]
+    starts = np.flatnonzero(np.r_[True, region[1:] != region[:-1]])
+
+    def by_region(matrix):
+        return np.add.reduceat(matrix[order], starts, axis=0)
+
+    return Rollup(
+        regions=columns.regions,
+        deputies=np.diff(np.r_[starts, len(region)]),
+        categories=by_region(columns.categories),
+        sessions=by_region(columns.sessions),
+        legislation=by_region(columns.legislation),
+        activity=by_region(columns.activity),
+    )
+
+
+def federal(rollup):
+    # Итог по стране — та же сводка с одним «регионом»
+    return Rollup(
+        regions=(FEDERAL,),
+        deputies=rollup.deputies.sum(keepdims=True),
+        categories=rollup.categories.sum(axis=0, keepdims=True),
+        sessions=rollup.sessions.sum(axis=0, keepdims=True),
+        legislation=rollup.legislation.sum(axis=0, keepdims=True),
+        activity=rollup.activity.sum(axis=0, keepdims=True),
+    )
+
+
+def attendance(rollup):
+    # Доля посещённых заседаний: органа власти, комитетов, фракции; NaN, если заседаний не было
+    attended = rollup.sessions[:, 1::2].astype(np.float64)
+    total = rollup.sessions[:, 0::2]
+    return np.divide(attended, total, out=np.full(attended.shape, np.nan), where=total > 0)
+
+
+def _region_dict(rollup, ratios, i):
+    return {
+        "region": rollup.regions[i],
+        "deputies": int(rollup.deputies[i]),
+        "requests": dict(zip(CATEGORY_LABELS, rollup.categories[i].tolist())),
+        "sessions": dict(zip(SESSION_FIELDS, rollup.sessions[i].tolist())),
+        "attendance": {
+            name: None if np.isnan(value) else round(float(value), 4)
+            for name, value in zip(("sessions", "committee", "ldpr"), ratios[i])
+        },
+        "legislation": dict(zip(LEGISLATION_FIELDS, rollup.legislation[i].tolist())),
+        "activity": dict(zip(ACTIVITY_FIELDS, rollup.activity[i].tolist())),
+    }
+
+
+def to_dict(rollup):
+    total = federal(rollup)
+    ratios = attendance(rollup)
+    return {
+        "total": {**_region_dict(total, attendance(total), 0), "regions": len(rollup.regions)},
+        "regions": [_region_dict(rollup, ratios, i) for i in range(len(rollup.regions))],
+    }
+
+
+def chart_data(categories):
+    # Строки диаграммы как в report_ir: без нулей, по убыванию, при равенстве — в порядке CHART_CATEGORIES
+    order = np.argsort(-categories, kind="stable")
+    rows = tuple((CATEGORY_LABELS[i], int(categories[i])) for i in order if categories[i] > 0)
+    return ChartData(chart_rows=rows, chart_max=int(categories.max(initial=0)))
+
+
+def _percent(value):
+    return "—" if np.isnan(value) else f"{value:.0%}"
+
+
+def generate_rollup_html(rollup, period=None):
+    # HTML сводки и PNG-файлы диаграмм (при CHART_FORMAT=png), которые удаляются после вёрстки
+    total = federal(rollup)
+    ratios = attendance(rollup)
+    total_ratios = attendance(total)
+    images_paths = []
+
+    def requests_html(summary, i):
+        chart, paths = render_chart(chart_data(summary.categories[i]))
+        images_paths.extend(paths)
+        return render_rollup_requests(tuple(summary.activity[i].tolist()), chart)
+
+    def table_row(summary, summary_ratios, i):
+        return (
+            summary.regions[i],
+            int(summary.deputies[i]),
+            *summary.legislation[i].tolist(),
+            _percent(summary_ratios[i, 0]),
+            int(summary.categories[i].sum()),
+        )
+
+    try:
+        with metrics.stage("html"):
+            regions = range(len(rollup.regions))
+            sections = [
+                rollup_section("1. ИТОГИ ПО РЕГИОНАМ", render_rollup_table(
+                    [table_row(rollup, ratios, i) for i in regions],
+                    table_row(total, total_ratios, 0),
+                )),
+                rollup_section("2. РАБОТА С ОБРАЩЕНИЯМИ ГРАЖДАН", requests_html(total, 0)),
+                rollup_section("3. РЕГИОНЫ", "".join(
+                    render_rollup_region(
+                        rollup.regions[i],
+                        int(rollup.deputies[i]),
+                        tuple(rollup.legislation[i].tolist()),
+                        tuple(_percent(value) for value in ratios[i]),
+                        requests_html(rollup, i),
+                    )
+                    for i in regions
+                )),
+            ]
+            scope = rollup.regions[0] if len(rollup.regions) == 1 else FEDERAL
+            html_content = render_document(scope, period or config.REPORT_PERIOD, sections, ROLLUP_TITLE)
+    except BaseException:
+        _remove(images_paths)
+        raise
+    return html_content, images_paths
+
+
+def generate_rollup_pdf(rollup, output_filename=None):
+    # Выполняется в процессе пула или CLI; вёрстка и запись — те же, что у отчёта депутата
+    html_content, images_paths = generate_rollup_html(rollup)
+    try:
+        with metrics.stage("layout"):
+            document = layout_document(html_content, get_stylesheets())
+        with metrics.stage("write"):
+            pdf = document.write_pdf(output_filename, **write_options())
+        metrics.count("pages", len(document.pages))
+        metrics.count("pdf_bytes", len(pdf) if pdf is not None else os.path.getsize(output_filename))
+    finally:
+        _remove(images_paths)
+    return pdf
+
+
+def _remove(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def main(argv=None):
+    from app.cli import find_sources
+
+    parser = argparse.ArgumentParser(description="Сводный отчёт ЛДПР по регионам")
+    parser.add_argument("sources", nargs="+", help="JSON-файлы, каталоги или glob-шаблоны")
+    parser.add_argument("-o", "--output", help="PDF сводки")
+    parser.add_argument("--json", help="сводка в JSON (- — stdout)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1, help="процессов для чтения отчётов")
+    args = parser.parse_args(argv)
+    if not args.output and not args.json:
+        parser.error("nothing to do: pass -o and/or --json")
+
+    started = time.perf_counter()
+    sources = find_sources(args.sources)
+    rows = []
+    failed = 0
+    # Разбор и проверка JSON — самая дорогая часть, она идёт параллельно
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(args.workers, len(sources))),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        for source, (row, error) in zip(sources, executor.map(load_row, sources, chunksize=64)):
+            if row is None:
+                failed += 1
+                print(f"FAIL  {source}: {error}", file=sys.stderr)
+            else:
+                rows.append(row)
+    if not rows:
+        print("No valid reports", file=sys.stderr)
+        return 1
+    loaded = time.perf_counter()
+
+    rollup = aggregate(to_columns(rows))
+    aggregated = time.perf_counter()
+    if args.json:
+        output = json.dumps(to_dict(rollup), ensure_ascii=False, indent=2)
+        if args.json == "-":
+            print(output)
+        else:
+            with open(args.json, "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+    if args.output:
+        os.makedirs(config.TMP_DIR, exist_ok=True)
+        generate_rollup_pdf(rollup, args.output)
+    print(
+        f"{len(rows)} reports from {len(rollup.regions)} regions ({failed} invalid): "
+        f"load {loaded - started:.2f}s, aggregate {(aggregated - loaded) * 1000:.1f} ms, "
+        f"output {time.perf_counter() - aggregated:.2f}s",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
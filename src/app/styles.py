@@ -0,0 +1,87 @@
+import pathlib
+
+# weasyprint (в том числе через url_fetcher) импортируется при первом обращении, а не при загрузке модуля
+
+
+# Статические стили шаблона в порядке каскада: шрифты, сброс стилей, стили отчёта
+TEMPLATE_STYLESHEETS = (
+    "https://fonts.googleapis.com/css2?family=Geologica:wght@400;500;600&display=swap",
+    "https://fonts.googleapis.com/css2?family=Bebas+Neue&display=swap",
+    "https://cdnjs.cloudflare.com/ajax/libs/meyer-reset/2.0/reset.min.css",
+)
+REPORT_CSS = pathlib.Path(__file__).parent / "assets" / "report.css"
+
+# Дополнения для отчёта, свёрстанного по частям (см. pdf_creater.render_pdf_chunk):
+# части без колонтитулов, у всех частей кроме первой нет шапки и первая страница обычная,
+# а документ с колонтитулами прозрачен, чтобы его можно было наложить поверх страниц
+CHUNK_CSS = "@page { @bottom-right { content: none; } }"
+NEXT_CHUNK_CSS = "@page :first { margin: 1cm 0cm 1cm 0cm; }"
+FOOTER_CSS = "html, body { background: none; }"
+
+_font_config = None
+_stylesheets = None
+_extra_stylesheets = {}
+_preview_styles = None
+
+
+def get_font_config():
+    global _font_config
+    if _font_config is None:
+        from weasyprint.text.fonts import FontConfiguration
+        _font_config = FontConfiguration()
+    return _font_config
+
+
+def get_stylesheets():
+    # Разбираются один раз на процесс и переиспользуются всеми рендерами
+    global _stylesheets
+    if _stylesheets is None:
+        from weasyprint import CSS
+        from app.url_fetcher import get_url_fetcher
+        url_fetcher = get_url_fetcher()
+        font_config = get_font_config()
+        stylesheets = [
+            CSS(url=url, url_fetcher=url_fetcher, font_config=font_config)
+            for url in TEMPLATE_STYLESHEETS
+        ]
+        stylesheets.append(CSS(filename=str(REPORT_CSS), url_fetcher=url_fetcher, font_config=font_config))
+        _stylesheets = stylesheets
+    return _stylesheets
+
+
+def get_chunk_stylesheets(first):
+    if first:
+        return [_extra_stylesheet(CHUNK_CSS)]
+    return [_extra_stylesheet(CHUNK_CSS), _extra_stylesheet(NEXT_CHUNK_CSS)]
+
+
+def get_footer_stylesheets():
+    return get_stylesheets() + [_extra_stylesheet(FOOTER_CSS)]
+
+
+def _extra_stylesheet(css):
+    stylesheet = _extra_stylesheets.get(css)
+    if stylesheet is None:
+        from weasyprint import CSS
+        stylesheet = _extra_stylesheets[css] = CSS(string=css, font_config=get_font_config())
+    return stylesheet
+
+
+def inline_styles():
+    # Для отладочного HTML: те же стили, но прямо в документе
+    from app.url_fetcher import get_url_fetcher
+    css = "".join(get_url_fetcher().fetch(url).read().decode("utf-8") for url in TEMPLATE_STYLESHEETS)
+    return f"<style>{css}{REPORT_CSS.read_text(encoding='utf-8')}</style>"
+
+
+def preview_styles():
+    # Для предпросмотра в браузере: внешние стили ссылками, стили отчёта — прямо в документе
+    global _preview_styles
+    if _preview_styles is None:
+        links = "".join(f'<link rel="stylesheet" href="{url}">' for url in TEMPLATE_STYLESHEETS)
+        _preview_styles = f"{links}<style>{REPORT_CSS.read_text(encoding='utf-8')}</style>"
+    return _preview_styles
+
+
+def warm_up():
+    get_stylesheets()
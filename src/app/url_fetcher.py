@@ -0,0 +1,67 @@
+import pathlib
+from collections import OrderedDict
+
+from weasyprint.urls import URLFetcher, URLFetcherResponse
+
+from app import config
+
+
+ASSETS_DIR = pathlib.Path(__file__).parent / "assets"
+
+# Внешние ресурсы шаблона, которые поставляются вместе с сервисом
+BUNDLED_ASSETS = {
+    "https://fonts.googleapis.com/css2?family=Geologica:wght@400;500;600&display=swap": "geologica.css",
+    "https://fonts.gstatic.com/s/geologica/v1.010/Geologica.ttf": "Geologica.ttf",
+    "https://fonts.googleapis.com/css2?family=Bebas+Neue&display=swap": "fonts.css",
+    "https://cdnjs.cloudflare.com/ajax/libs/meyer-reset/2.0/reset.min.css": "reset.min.css",
+}
+
+MEDIA_TYPES = {
+    ".css": "text/css",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".woff2": "font/woff2",
+    ".ttf": "font/ttf",
+}
+
+
+class CachingURLFetcher(URLFetcher):
+    # Встроенные ресурсы отдаются из памяти, остальные http(s) запрашиваются
+    # с коротким таймаутом и тоже запоминаются.
+
+    def __init__(self):
+        super().__init__(timeout=config.REMOTE_FETCH_TIMEOUT)
+        self._bundled = {}
+        for url, filename in BUNDLED_ASSETS.items():
+            path = ASSETS_DIR / filename
+            self._bundled[url] = (path.read_bytes(), MEDIA_TYPES[path.suffix])
+        self._remote = OrderedDict()
+
+    def fetch(self, url, headers=None):
+        cached = self._bundled.get(url) or self._remote.get(url)
+        if cached is not None:
+            body, media_type = cached
+            return URLFetcherResponse(url, body, {"Content-Type": media_type})
+        if not url.startswith(("http://", "https://")):
+            return super().fetch(url, headers)
+
+        response = super().fetch(url, headers)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        media_type = response.headers.get("Content-Type", "application/octet-stream")
+        self._remote[url] = (body, media_type)
+        while len(self._remote) > config.REMOTE_FETCH_CACHE_ENTRIES:
+            self._remote.popitem(last=False)
+        return URLFetcherResponse(url, body, {"Content-Type": media_type})
+
+
+_url_fetcher = None
+
+
+def get_url_fetcher():
+    global _url_fetcher
+    if _url_fetcher is None:
+        _url_fetcher = CachingURLFetcher()
+    return _url_fetcher
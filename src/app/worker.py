@@ -0,0 +1,42 @@
+import asyncio
+import signal
+import sys
+import time
+
+from app import config, jobs, metrics, render_pool
+
+
+# Исполнитель фоновых задач без HTTP: берёт задачи /jobs из общей очереди и пишет PDF
+# в общий MEDIA_DIR, откуда их отдаёт любой экземпляр API. Таких процессов может быть несколько.
+# Запуск из src: QUEUE_BACKEND=sqlite python -m app.worker
+
+
+async def serve():
+    started = time.perf_counter()
+    render_pool.start()
+    if config.RENDER_WARMUP:
+        boots = await render_pool.warm_up()
+        metrics.record_boot(boots.values(), time.perf_counter() - started)
+    jobs.start()
+    print(f"Worker ready in {time.perf_counter() - started:.2f}s, {config.RENDER_WORKERS} render processes", file=sys.stderr)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    # Незаконченные задачи возвращаются в очередь
+    await jobs.stop()
+    render_pool.shutdown()
+
+
+def main():
+    if config.QUEUE_BACKEND == "memory":
+        print("QUEUE_BACKEND=memory: the queue lives inside the API process, nothing to work on", file=sys.stderr)
+        return 1
+    asyncio.run(serve())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import time
+
+from app import config
+from app.model import LDPRReport
+from app.pdf_creater import generate_html_chunks, generate_pdf_report, merge_pdf_chunks, render_pdf_chunk
+from app.report_ir import from_model
+from bench.synthetic import generate_report
+
+
+# Один и тот же большой отчёт целиком и по частям (как в report_renderer для больших отчётов):
+# оба PDF сохраняются для просмотра глазами, а в JSON — сверка номеров страниц в колонтитулах
+# и текста. Части верстаются здесь же по очереди, поэтому время — не время параллельного режима.
+# Запуск из src (нужна настоящая WeasyPrint, например в Docker):
+#   python -m bench.chunks --legislation 300 --chunks 4 -o /tmp/chunks
+
+FOOTER_RE = re.compile(r"(\d+)\s*/\s*(\d+)\s*$")
+
+
+def page_texts(pdf):
+    from pypdf import PdfReader
+    return [page.extract_text() or "" for page in PdfReader(io.BytesIO(pdf)).pages]
+
+
+def footers(texts):
+    # Колонтитул "N / M" — последний текст на странице
+    result = []
+    for text in texts:
+        match = FOOTER_RE.search(text.strip())
+        result.append((int(match.group(1)), int(match.group(2))) if match else None)
+    return result
+
+
+def body_words(texts):
+    # Текст документа без колонтитулов и разбиения на строки и страницы
+    return " ".join(FOOTER_RE.sub("", text.strip()) for text in texts).split()
+
+
+def compare(single, chunked):
+    single_texts = page_texts(single)
+    chunked_texts = page_texts(chunked)
+    total = len(chunked_texts)
+    expected = [(i + 1, total) for i in range(total)]
+    chunked_footers = footers(chunked_texts)
+    return {
+        "single_pages": len(single_texts),
+        "chunked_pages": total,
+        "footers_ok": chunked_footers == expected,
+        "bad_footers": [
+            {"page": i + 1, "found": found}
+            for i, (found, want) in enumerate(zip(chunked_footers, expected)) if found != want
+        ],
+        "same_text": body_words(single_texts) == body_words(chunked_texts),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сверка отчёта, свёрстанного целиком и по частям")
+    parser.add_argument("--legislation", type=int, default=300)
+    parser.add_argument("--projects", type=int, default=60)
+    parser.add_argument("--examples", type=int, default=20)
+    parser.add_argument("--orders", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output-dir", default=".", help="куда сохранить single.pdf и chunked.pdf")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    os.makedirs(config.TMP_DIR, exist_ok=True)
+    report = from_model(LDPRReport(**generate_report(
+        seed=args.seed,
+        legislation=args.legislation,
+        projects=args.projects,
+        examples=args.examples,
+        orders=args.orders,
+    )))
+
+    started = time.perf_counter()
+    single = generate_pdf_report(report)
+    single_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    documents, images_paths = generate_html_chunks(report, args.chunks)
+    try:
+        chunks = [render_pdf_chunk(html_content, i == 0) for i, html_content in enumerate(documents)]
+    finally:
+        for image_path in images_paths:
+            if os.path.exists(image_path):
+                os.remove(image_path)
+    chunked = merge_pdf_chunks(chunks)
+    chunked_seconds = time.perf_counter() - started
+
+    for name, pdf in (("single.pdf", single), ("chunked.pdf", chunked)):
+        with open(os.path.join(args.output_dir, name), "wb") as f:
+            f.write(pdf)
+    result = {
+        "items": report.item_count,
+        "chunks": len(documents),
+        "chart_format": config.CHART_FORMAT,
+        "pdf_profile": config.PDF_PROFILE,
+        "single_seconds": round(single_seconds, 3),
+        "chunked_sequential_seconds": round(chunked_seconds, 3),
+        "single_bytes": len(single),
+        "chunked_bytes": len(chunked),
+        **compare(single, chunked),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result["footers_ok"] and result["same_text"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from app.cli import find_sources
+from bench.synthetic import generate_report
+
+
+# Нагрузочный прогон POST / на запущенном сервере. Запуск из src:
+#   python -m bench.load --concurrency 8 --duration 60                  8 клиентов подряд
+#   python -m bench.load --rate 5 --duration 60 reports/ --pid 1234     5 запросов/с из каталога
+# --pid — процесс uvicorn: RSS считается по нему и всем дочерним (воркерам рендера),
+# без него RSS берётся из /metrics и это только процесс API.
+
+RSS_INTERVAL = 0.5
+METRICS_RSS_RE = re.compile(r"^ldpr_process_rss_bytes (\d+)", re.M)
+
+
+def load_corpus(sources, synthetic, seed):
+    if sources:
+        corpus = []
+        for source in find_sources(sources):
+            with open(source, encoding="utf-8") as f:
+                corpus.append(json.load(f))
+        return corpus
+    # Синтетические отчёты разного объёма: от пустых до крупных
+    rng = random.Random(seed)
+    return [
+        generate_report(
+            seed=seed + i,
+            legislation=rng.randint(0, 30),
+            examples=rng.randint(0, 10),
+            projects=rng.randint(0, 15),
+            orders=rng.randint(0, 10),
+            svo_projects=rng.randint(0, 10),
+        )
+        for i in range(synthetic)
+    ]
+
+
+def encode(report, index, unique):
+    if unique:
+        # Одинаковый отчёт сервер отдаст из кэша готовых PDF; метка делает каждый запрос новым
+        report = {**report, "other_info": f"{report.get('other_info') or ''} #{index}"}
+    return json.dumps(report, ensure_ascii=False).encode("utf-8")
+
+
+class Client:
+    # Одно keep-alive соединение на поток; после ошибки соединение открывается заново
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path += f"?{parts.query}"
+        self.timeout = timeout
+        self.connection = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None):
+        if self.connection is None:
+            self.connection = self._connect()
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+        return response.status, data
+
+    def post(self, body):
+        return self.request("POST", self.path, body)
+
+
+def process_tree_rss(pid):
+    # RSS процесса и всех его потомков по /proc (Linux)
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status", encoding="ascii") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children", encoding="ascii") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def metrics_rss(client):
+    try:
+        status, data = client.request("GET", "/metrics")
+    except (OSError, http.client.HTTPException):
+        return None
+    match = METRICS_RSS_RE.search(data.decode("utf-8", "replace")) if status == 200 else None
+    return int(match.group(1)) if match else None
+
+
+def sample_rss(args, samples, stop):
+    client = Client(args.url, args.timeout)
+    while not stop.is_set():
+        rss = process_tree_rss(args.pid) if args.pid else metrics_rss(client)
+        if rss:
+            samples.append(rss)
+        stop.wait(RSS_INTERVAL)
+
+
+def percentile(samples, p):
+    # Ближайший ранг: значение, не меньше которого p% наблюдений
+    if not samples:
+        return None
+    index = max(0, min(len(samples) - 1, int(len(samples) * p / 100 + 0.999999) - 1))
+    return samples[index]
+
+
+def run(args, corpus):
+    results = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    counter = iter(range(sys.maxsize))
+    started = time.perf_counter()
+    deadline = started + args.duration if args.duration else None
+
+    def next_index():
+        with lock:
+            index = next(counter)
+        if args.requests and index >= args.requests:
+            return None
+        if deadline and time.perf_counter() >= deadline:
+            return None
+        return index
+
+    def send(client, index, scheduled):
+        body = encode(corpus[index % len(corpus)], index, not args.allow_cache)
+        status, error = None, None
+        try:
+            status, _ = client.post(body)
+        except (OSError, http.client.HTTPException) as e:
+            error = type(e).__name__
+        # При заданной частоте задержка считается от назначенного времени отправки:
+        # если сервер тормозит и клиенты не успевают, ожидание тоже попадает в задержку
+        finished = time.perf_counter()
+        with lock:
+            results.append((finished - started, finished - scheduled, status, error))
+
+    def closed_loop():
+        client = Client(args.url, args.timeout)
+        while (index := next_index()) is not None:
+            send(client, index, time.perf_counter())
+
+    arrivals = queue.Queue()
+
+    def open_loop_worker():
+        client = Client(args.url, args.timeout)
+        while (item := arrivals.get()) is not None:
+            send(client, *item)
+
+    if args.rate:
+        threads = [threading.Thread(target=open_loop_worker, daemon=True) for _ in range(args.concurrency)]
+    else:
+        threads = [threading.Thread(target=closed_loop, daemon=True) for _ in range(args.concurrency)]
+    rss_samples = []
+    sampler = threading.Thread(target=sample_rss, args=(args, rss_samples, stop), daemon=True)
+    sampler.start()
+    for thread in threads:
+        thread.start()
+
+    if args.rate:
+        # Пуассоновский поток запросов: интервалы экспоненциальные со средним 1/rate
+        rng = random.Random(args.seed)
+        scheduled = started
+        while (index := next_index()) is not None:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            arrivals.put((index, scheduled))
+            scheduled += rng.expovariate(args.rate)
+        for _ in threads:
+            arrivals.put(None)
+
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+    return summarize(results, elapsed, rss_samples)
+
+
+def summarize(results, elapsed, rss_samples):
+    latencies = sorted(latency for _, latency, status, error in results if error is None and 200 <= status < 300)
+    errors = {}
+    for _, _, status, error in results:
+        if error is not None or not 200 <= status < 300:
+            key = error or str(status)
+            errors[key] = errors.get(key, 0) + 1
+    total = len(results)
+    failed = sum(errors.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "ok": total - failed,
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "errors": errors,
+        "throughput_rps": round((total - failed) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {
+            name: round(value * 1000, 1) if value is not None else None
+            for name, value in (
+                ("p50", percentile(latencies, 50)),
+                ("p95", percentile(latencies, 95)),
+                ("p99", percentile(latencies, 99)),
+                ("max", latencies[-1] if latencies else None),
+            )
+        },
+        "server_rss_mb": {
+            "max": round(max(rss_samples) / 1024 / 1024, 1) if rss_samples else None,
+            "last": round(rss_samples[-1] / 1024 / 1024, 1) if rss_samples else None,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон POST / с перцентилями задержки")
+    parser.add_argument("sources", nargs="*", help="JSON-отчёты, каталоги или glob-шаблоны; без них — синтетические")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/", help="адрес POST, можно с ?format=pdf")
+    parser.add_argument("--concurrency", type=int, default=4, help="одновременных клиентов (при --rate — предел запросов в полёте)")
+    parser.add_argument("--rate", type=float, help="запросов в секунду (открытая модель); без него клиенты шлют подряд")
+    parser.add_argument("--duration", type=float, default=30, help="секунд прогона, 0 — только по --requests")
+    parser.add_argument("--requests", type=int, help="остановиться после стольких запросов")
+    parser.add_argument("--synthetic", type=int, default=50, help="сколько синтетических отчётов сгенерировать")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--allow-cache", action="store_true", help="слать отчёты как есть, повторы попадут в кэш сервера")
+    parser.add_argument("--pid", type=int, help="PID сервера для замера RSS вместе с воркерами")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="файл для JSON, по умолчанию stdout")
+    args = parser.parse_args(argv)
+    if not args.duration and not args.requests:
+        parser.error("--duration 0 needs --requests")
+
+    corpus = load_corpus(args.sources, args.synthetic, args.seed)
+    if not corpus:
+        parser.error("no reports to send")
+    summary = run(args, corpus)
+    result = {
+        "url": args.url,
+        "python": platform.python_version(),
+        "params": {
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "requests": args.requests,
+            "corpus": len(corpus),
+            "unique": not args.allow_cache,
+        },
+        **summary,
+    }
+    latency = summary["latency_ms"]
+    print(
+        f"{summary['requests']} requests in {summary['elapsed_s']:.1f}s: {summary['throughput_rps']:.2f} ok/s, "
+        f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+        f"errors {summary['error_rate']:.1%}, server RSS max {summary['server_rss_mb']['max']} MB",
+        file=sys.stderr,
+    )
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if summary["ok"] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from app import config, morphology
+from app.chart_cache import bar_cache
+from app.charts import render_svg_chart
+from app.model import LDPRReport
+from app.report_ir import from_model
+from app.pdf_creater import (
+    TEMPLATE_VERSION,
+    _render_options,
+    generate_bar_chart,
+    generate_html_report,
+    layout_document,
+    write_options,
+)
+from app.styles import get_font_config, get_stylesheets, inline_styles
+from bench.synthetic import generate_report
+
+
+# Запуск из src: python -m bench.stages --legislation 50 --repeat 5 > result.json
+# До и после разбора стилей один раз на процесс (нужна настоящая WeasyPrint, например в Docker):
+#   python -m bench.stages --per-render-styles > before.json && python -m bench.stages > after.json
+# и сравнить stages.layout и stages.total.
+
+
+def layout_per_render(html_content):
+    # Как было до общих стилей: CSS прямо в документе и новая FontConfiguration на каждый рендер,
+    # остальные параметры вёрстки те же
+    from weasyprint import HTML
+    from weasyprint.text.fonts import FontConfiguration
+    from app.url_fetcher import get_url_fetcher
+
+    html_content = html_content.replace("</head>", f"{inline_styles()}</head>", 1)
+    return HTML(string=html_content, url_fetcher=get_url_fetcher()).render(
+        font_config=FontConfiguration(),
+        **_render_options(),
+    )
+
+
+def morphology_calls(report):
+    # Те же обращения к морфологии, что делает report_template при сборке HTML
+    sessions = report.general_info.sessions
+    requests = report.citizen_requests
+    calls = [
+        ("заседание", sessions.total.value),
+        ("заседание", sessions.committee_total.value),
+        ("заседание", sessions.ldpr_total.value),
+        ("законопроект", len(report.legislation)),
+        ("прием", requests.personal_meetings.value),
+        ("встреча", requests.receptions),
+        ("ответ", requests.responses.value),
+        ("запрос", requests.official_queries.value),
+    ]
+    for noun, count in calls:
+        morphology.declense_noun(noun, count)
+    if len(requests.examples) == 1:
+        morphology.inflect("достижение", frozenset({'nomn', 'sing'}))
+    else:
+        morphology.inflect("достижения", frozenset({'nomn', 'plur'}))
+
+
+def clear_caches():
+    # Каждый прогон меряет холодный путь, иначе стадии после первого прогона почти бесплатны
+    morphology.inflect.cache_clear()
+    morphology.declense_noun.cache_clear()
+    bar_cache.clear()
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return {
+        "min_ms": round(samples[0] * 1000, 3),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def run(raw, repeat, warm, per_render_styles=False):
+    timings = {name: [] for name in ("validation", "normalize", "morphology", "chart", "html", "layout", "write", "total")}
+    result = {}
+
+    started = time.perf_counter()
+    morphology.get_analyzer()
+    get_stylesheets()
+    get_font_config()
+    result["setup_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    for _ in range(repeat):
+        if not warm:
+            clear_caches()
+        total = time.perf_counter()
+
+        started = time.perf_counter()
+        model = LDPRReport(**raw)
+        timings["validation"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        report = from_model(model)
+        timings["normalize"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        morphology_calls(report)
+        timings["morphology"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        if config.CHART_FORMAT == "png":
+            for image_path in generate_bar_chart(report.citizen_requests):
+                os.remove(image_path)
+        else:
+            render_svg_chart(report.citizen_requests)
+        timings["chart"].append(time.perf_counter() - started)
+
+        # Полосы уже в bar_cache, поэтому диаграмма здесь почти ничего не стоит
+        started = time.perf_counter()
+        html_content, images_paths = generate_html_report(report)
+        timings["html"].append(time.perf_counter() - started)
+
+        try:
+            started = time.perf_counter()
+            if per_render_styles:
+                document = layout_per_render(html_content)
+            else:
+                document = layout_document(html_content, get_stylesheets())
+            timings["layout"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            pdf = document.write_pdf(**write_options())
+            timings["write"].append(time.perf_counter() - started)
+        finally:
+            for image_path in images_paths:
+                os.remove(image_path)
+        timings["total"].append(time.perf_counter() - total)
+
+    result["html_bytes"] = len(html_content.encode("utf-8"))
+    result["pdf_bytes"] = len(pdf)
+    result["pages"] = len(document.pages)
+    result["stages"] = {name: summary(samples) for name, samples in timings.items()}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время стадий генерации отчёта на синтетических данных")
+    parser.add_argument("--legislation", type=int, default=5)
+    parser.add_argument("--examples", type=int, default=3)
+    parser.add_argument("--projects", type=int, default=3)
+    parser.add_argument("--orders", type=int, default=2)
+    parser.add_argument("--committees", type=int, default=2)
+    parser.add_argument("--svo-projects", type=int, default=2)
+    parser.add_argument("--text-length", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warm", action="store_true", help="не сбрасывать кэши морфологии и диаграмм между прогонами")
+    parser.add_argument(
+        "--per-render-styles", action="store_true",
+        help="разбирать стили и создавать FontConfiguration заново на каждый рендер (замер «до»)",
+    )
+    parser.add_argument("--output", help="файл для JSON, по умолчанию stdout")
+    args = parser.parse_args(argv)
+
+    params = {
+        "legislation": args.legislation,
+        "examples": args.examples,
+        "projects": args.projects,
+        "orders": args.orders,
+        "committees": args.committees,
+        "svo_projects": args.svo_projects,
+        "text_length": args.text_length,
+    }
+    os.makedirs(config.TMP_DIR, exist_ok=True)
+    raw = generate_report(seed=args.seed, **params)
+    result = {
+        "template_version": TEMPLATE_VERSION,
+        "chart_format": config.CHART_FORMAT,
+        "pdf_profile": config.PDF_PROFILE,
+        "styles": "per-render" if args.per_render_styles else "per-process",
+        "python": platform.python_version(),
+        "params": {**params, "seed": args.seed, "repeat": args.repeat, "warm": args.warm},
+        **run(raw, args.repeat, args.warm, args.per_render_styles),
+    }
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import random
+
+from app.charts import CHART_CATEGORIES
+
+
+WORDS = (
+    "депутат", "обращение", "граждан", "район", "дорога", "ремонт", "школа", "больница",
+    "программа", "бюджет", "поддержка", "семья", "участник", "проект", "контроль", "жилье",
+    "благоустройство", "администрация", "решение", "вопрос", "помощь", "область", "закон",
+    "комитет", "заседание", "инициатива", "строительство", "транспорт", "экология", "двор",
+)
+STATUSES = ("Принято", "Отклонено", "На рассмотрении", "Принято в первом чтении")
+
+
+def text(rng, length):
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words).capitalize() + "."
+
+
+def generate_report(
+    seed=0,
+    legislation=5,
+    examples=3,
+    projects=3,
+    orders=2,
+    committees=2,
+    svo_projects=2,
+    text_length=200,
+    max_requests=30,
+):
+    # Синтетический отчёт в формате JSON, который принимает POST /
+    rng = random.Random(seed)
+
+    def number(low, high):
+        return str(rng.randint(low, high))
+
+    total = int(number(5, 40))
+    committee_total = int(number(5, 40))
+    ldpr_total = int(number(2, 20))
+    return {
+        "general_info": {
+            "full_name": f"Тестов {rng.choice(('Иван', 'Пётр', 'Анна'))} Сергеевич {seed}",
+            "district": f"Избирательный округ №{rng.randint(1, 50)}",
+            "term_start": "2021",
+            "term_end": "2026",
+            "links": [f"https://example.ru/deputy/{seed}/{i}" for i in range(2)],
+            "position": "Депутат",
+            "committees": [text(rng, 40) for _ in range(committees)],
+            "sessions_attended": {
+                "total": str(total),
+                "attended": str(rng.randint(0, total)),
+                "committee_total": str(committee_total),
+                "committee_attended": str(rng.randint(0, committee_total)),
+                "ldpr_total": str(ldpr_total),
+                "ldpr_attended": str(rng.randint(0, ldpr_total)),
+            },
+            "region": rng.choice(("Тверская область", "Пермский край", "Республика Татарстан")),
+            "authority_name": "Законодательное собрание",
+            "ldpr_position": "Руководитель фракции",
+        },
+        "legislation": [
+            {
+                "title": text(rng, 60).rstrip("."),
+                "summary": text(rng, text_length),
+                "status": rng.choice(STATUSES),
+                "rejection_reason": text(rng, 60) if rng.random() < 0.3 else None,
+                "links": [],
+            }
+            for _ in range(legislation)
+        ],
+        "citizen_requests": {
+            "personal_meetings": number(0, 100),
+            "requests": {
+                **{field: number(0, max_requests) for _, field in CHART_CATEGORIES},
+                "appeals_to_ldpr_chairman": number(0, 10),
+            },
+            "responses": number(0, 200),
+            "official_queries": number(0, 100),
+            "examples": [{"text": text(rng, text_length), "links": []} for _ in range(examples)],
+            "total_requests": number(0, 300),
+        },
+        "svo_support": {
+            "projects": [{"name": text(rng, 30), "text": text(rng, text_length), "links": []} for _ in range(svo_projects)],
+        },
+        "project_activity": [
+            {"name": text(rng, 40).rstrip("."), "result": text(rng, text_length)}
+            for _ in range(projects)
+        ],
+        "ldpr_orders": [
+            {"instruction": text(rng, 60).rstrip("."), "action": text(rng, text_length)}
+            for _ in range(orders)
+        ],
+        "other_info": text(rng, text_length),
+        "citizen_day_receptions": {month: rng.randint(0, 3) for month in ("january", "february", "march")},
+    }
@@ -0,0 +1,33 @@
+import asyncio
+import sqlite3
+import time
+
+from app.backends import DONE, FAILED, RUNNING, Job, SqliteJobStore
+from app.model import LDPRReport
+from bench.synthetic import generate_report
+
+
+def test_stale_executor_loses_job(tmp_path):
+    # Исполнитель, простоявший дольше JOBS_LEASE, не трогает задачу, которую уже взял другой
+    path = str(tmp_path / "state.sqlite3")
+    store = SqliteJobStore(path)
+
+    async def scenario():
+        await store.add(Job(LDPRReport(**generate_report(seed=1)), "report_1.pdf"))
+        stale = await store.claim()
+        with sqlite3.connect(path) as db:
+            db.execute("UPDATE jobs SET heartbeat_at = 0 WHERE id = ?", (stale.id,))
+        owner = await store.claim()
+        assert owner.id == stale.id
+
+        assert not await store.heartbeat(stale)
+        assert await store.heartbeat(owner)
+        stale.status, stale.error, stale.finished_at = FAILED, "stale", time.time()
+        assert await store.finish(stale) is None
+        await store.requeue(stale)
+        assert (await store.get(owner.id)).status == RUNNING
+
+        owner.status, owner.finished_at = DONE, time.time()
+        assert await store.finish(owner) == DONE
+
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+import asyncio
+import os
+import signal
+import time
+
+from app import config, render_pool
+
+
+def test_idle_worker_killed(monkeypatch):
+    # Процесс, убитый без задачи (OOM killer), заменяется при следующем рендере на его месте
+    monkeypatch.setenv("RENDER_WARMUP", "0")
+    monkeypatch.setattr(config, "RENDER_WARMUP", False)
+    monkeypatch.setattr(config, "RENDER_WORKERS", 2)
+
+    async def renders():
+        return set(await asyncio.gather(*(render_pool.run(os.getpid) for _ in range(config.RENDER_WORKERS))))
+
+    async def scenario():
+        try:
+            pids = await renders()
+            assert len(pids) == 2
+            killed = pids.pop()
+            os.kill(killed, signal.SIGKILL)
+            # executor замечает смерть процесса в своём потоке
+            time.sleep(0.5)
+            for _ in range(3):
+                after = await renders()
+                assert killed not in after
+                assert len(after) == 2
+        finally:
+            render_pool.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,12 @@
+from app.report_template import Template
+
+
+def test_fields():
+    assert Template("<p>{a} и {b}</p>").render(a="1", b="2") == "<p>1 и 2</p>"
+
+
+def test_escaped_braces():
+    # {{ и }} — литеральные скобки, например во встроенном CSS
+    assert Template("p {{ color: red }} {x}").render(x="X") == "p { color: red } X"
+    assert Template("{x}{{}}{y}").render(x="1", y="2") == "1{}2"
+    assert Template("{{{x}}}").render(x="1") == "{1}"